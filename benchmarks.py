@@ -0,0 +1,233 @@
+'''Benchmarks for the hot paths of the assistant.
+
+Every case runs in a temporary folder on synthetic data, so real contacts.txt
+and notes_book.json are never touched. Usage:
+
+    python benchmarks.py --size 10000
+    python benchmarks.py --save-baseline baseline.json
+    python benchmarks.py --compare baseline.json --threshold 0.2
+'''
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from pathlib import Path
+from statistics import median
+
+import bot
+import main
+import note
+import sorter
+import storage
+
+
+FILE_EXTENSIONS = ['.jpg', '.png', '.mp4', '.txt', '.pdf', '.mp3', '.wav', '.bin', '.csv']
+WORDS = ['buy', 'milk', 'python', 'project', 'call', 'mom', 'meeting', 'report', 'bot', 'team']
+
+
+def random_name(rnd, length=8):
+    return rnd.choice(string.ascii_uppercase) + ''.join(rnd.choices(string.ascii_lowercase, k=length - 1))
+
+
+def random_phone(rnd):
+    return f"0{rnd.choice(['50', '63', '66', '67', '68', '73', '93', '95', '96', '97', '98', '99'])}" \
+           f"-{rnd.randint(0, 999):03}-{rnd.randint(0, 99):02}-{rnd.randint(0, 99):02}"
+
+
+def make_contacts(size, seed=0):
+    '''AddressBook with size contacts, 1-3 phones each and a birthday for most of them'''
+    rnd = random.Random(seed)
+    address_book = bot.AddressBook()
+    first_day = date(1950, 1, 1)
+
+    for i in range(size):
+        record = bot.Record(bot.Name(f"{random_name(rnd)}{i}"))
+        record.phones = bot.format_phones_to_list([random_phone(rnd) for _ in range(rnd.randint(1, 3))])
+        record.mail = bot.Mail(f"user{i}@example.com" if rnd.random() < 0.5 else None)
+        record.birthday = bot.Birthday(first_day + timedelta(days=rnd.randint(0, 365 * 55))
+                                       if rnd.random() < 0.8 else None)
+        address_book.add_record(record)
+
+    return address_book
+
+
+def make_notes(size, seed=0):
+    '''NoteBook with size notes, every note has a few words of text and 0-3 tags'''
+    rnd = random.Random(seed)
+    notebook = note.NoteBook()
+
+    for i in range(size):
+        text = note.Text(' '.join(rnd.choices(WORDS, k=rnd.randint(3, 20))))
+        new_note = note.Note(note.NameNote(f"n{i}"), text)
+        new_note.add_tag(rnd.sample(WORDS, rnd.randint(0, 3)))
+        notebook.add_notes(new_note)
+
+    return notebook
+
+
+def make_tree(root, files, depth, seed=0):
+    '''Folder tree with files spread over depth levels of nested folders'''
+    rnd = random.Random(seed)
+    folders = [Path(root)]
+
+    for level in range(depth):
+        folder = folders[-1] / f"level_{level}"
+        folder.mkdir()
+        folders.append(folder)
+
+    for i in range(files):
+        path = rnd.choice(folders) / f"file {i}{rnd.choice(FILE_EXTENSIONS)}"
+        path.write_bytes(b'x' * rnd.randint(0, 256))
+
+
+def measure(func, repeat, setup=None):
+    '''Return (median seconds, best seconds, peak memory KiB)'''
+    times = []
+
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+
+    args = setup() if setup else ()
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return median(times), min(times), peak / 1024
+
+
+def get_cases(size, tree_files, tree_depth):
+    address_book = make_contacts(size)
+    notebook = make_notes(size)
+    commands = ['show all', 'find Iv', 'update birthday Ivan 01.01.2000', 'check birthday Ivan', 'up', 'unknown']
+
+    def cold(cache):
+        '''Setup that empties the query cache, so the case measures the search itself'''
+        def setup():
+            cache.clear()
+            return ()
+        return setup
+
+    def sorter_setup():
+        root = tempfile.mkdtemp(dir='.')
+        make_tree(root, tree_files, tree_depth)
+        return (root,)
+
+    cases = {
+        'contacts.find_records': (lambda: address_book.find_records('Iv'), cold(address_book.cache)),
+        'contacts.find_records.cached': (lambda: address_book.find_records('Iv'), None),
+        'contacts.save_data': (address_book.save_data, None),
+        'contacts.iterator': (lambda: list(address_book.iterator(50)), None),
+        'notes.paginator': (lambda: list(notebook.paginator(notebook, 50)), None),
+        'notes.get_notes': (lambda: note.get_notes(notebook, ['python']), cold(notebook.cache)),
+        'sorter': (sorter.sorter, sorter_setup),
+        'main.handler': (lambda: [main.handler(command, bot.actions) for command in commands], None),
+    }
+
+    for compression in storage.COMPRESSIONS:
+        contacts_file = f'contacts.{compression}'
+        notes_file = f'notes.{compression}'
+        address_book.write_file(contacts_file, compression)
+        notebook.write_file(notes_file, compression)
+
+        cases[f'storage.{compression}.contacts_save'] = (
+            lambda c=compression, f=contacts_file: address_book.write_file(f, c), None)
+        cases[f'storage.{compression}.contacts_load'] = (lambda f=contacts_file: bot.AddressBook(f), None)
+        cases[f'storage.{compression}.notes_save'] = (
+            lambda c=compression, f=notes_file: notebook.write_file(f, c), None)
+        cases[f'storage.{compression}.notes_load'] = (lambda f=notes_file: load_notes(f), None)
+
+    return cases
+
+
+def load_notes(filename):
+    notebook = note.NoteBook()
+    notebook.filename = filename
+    notebook.recover_from_file()
+    return notebook
+
+
+def file_sizes():
+    return {name: os.path.getsize(name) for name in sorted(os.listdir('.')) 
+            if name.startswith(('contacts.', 'notes.')) and os.path.isfile(name)}
+
+
+def compare(results, baseline, threshold):
+    '''Print the ratio to the baseline for every case, return names of regressed cases'''
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['median'] / baseline[name]['median'] if baseline[name]['median'] else 1
+        status = 'REGRESSION' if ratio > 1 + threshold else 'ok'
+        print(f"{name:<30} {ratio:6.2f}x  {status}")
+        if status != 'ok':
+            regressions.append(name)
+
+    return regressions
+
+
+def main_benchmarks(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for contacts, notes, sorter and command dispatch')
+    parser.add_argument('--size', type=int, default=10000, help='number of contacts and notes')
+    parser.add_argument('--tree-files', type=int, default=300, help='number of files for sorter')
+    parser.add_argument('--tree-depth', type=int, default=3, help='folder depth for sorter')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help='run only cases with these name prefixes')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown against baseline')
+    args = parser.parse_args(argv)
+
+    baseline_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    results = {}
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as folder, open(os.devnull, 'w') as devnull:
+        os.chdir(folder)
+        try:
+            with redirect_stdout(devnull):
+                cases = get_cases(args.size, args.tree_files, args.tree_depth)
+
+            for name, (func, setup) in cases.items():
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                with redirect_stdout(devnull):
+                    middle, best, peak = measure(func, args.repeat, setup)
+                results[name] = {'median': middle, 'best': best, 'peak_kb': peak}
+                print(f"{name:<30} median {middle * 1000:10.2f} ms  best {best * 1000:10.2f} ms  peak {peak:10.1f} KiB")
+
+            if any(name.startswith('storage.') for name in results):
+                for name, size in file_sizes().items():
+                    print(f"{name:<30} size {size / 1024:10.1f} KiB")
+        finally:
+            os.chdir(cwd)
+
+    if baseline_path:
+        with open(baseline_path, 'w') as fh:
+            json.dump({'size': args.size, 'results': results}, fh, indent=3)
+
+    if compare_path:
+        with open(compare_path) as fh:
+            baseline = json.load(fh)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_benchmarks())
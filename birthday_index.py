@@ -0,0 +1,193 @@
+'''Sorted birthday index for range queries over the address book.
+
+Two sorted lists are kept: (date ordinal, name) for "born between" and age
+queries, and (month, day, name) for "birthdays in a month" and "next
+birthdays". Every query is a bisect plus a slice, so its cost depends on the
+size of the answer, not on the size of the book.
+
+Bulk reports over the whole book use year/month/day columns as NumPy arrays
+and compute days to birthday for every contact in one vectorized pass.
+NumPy is optional and imported on the first report, not with the address
+book. Without it the reports fall back to plain Python, both give the same
+order: by days to birthday, then by name.
+'''
+
+from bisect import bisect_left, insort
+from calendar import isleap
+from datetime import date, timedelta
+from heapq import nsmallest
+from itertools import chain, islice
+
+# Set by load_numpy, False if NumPy is not installed
+np = None
+
+
+# Day of year before the first day of every month in a non leap year
+MONTH_OFFSETS = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def birthday_in_year(birthday: date, year: int) -> date:
+    '''29 February is celebrated on 1 March in non leap years'''
+    try:
+        return birthday.replace(year=year)
+    except ValueError:
+        return date(year, 3, 1)
+
+
+def days_to_birthday(birthday: date, today: date) -> int:
+    next_birthday = birthday_in_year(birthday, today.year)
+    if next_birthday < today:
+        next_birthday = birthday_in_year(birthday, today.year + 1)
+    return (next_birthday - today).days
+
+
+def years_before(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return date(day.year - years, 2, 28)
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np or None
+
+
+def birthday_columns(ordinals):
+    '''Split date ordinals into (years, months, days) arrays without creating date objects'''
+    dates = (np.asarray(ordinals, dtype=np.int64) - UNIX_EPOCH_ORDINAL).astype('datetime64[D]')
+    years = dates.astype('datetime64[Y]')
+    months = dates.astype('datetime64[M]')
+    return (years.astype(np.int64) + 1970,
+            (months - years).astype(np.int64) + 1,
+            (dates - months).astype(np.int64) + 1)
+
+
+def day_of_year(months, days, year):
+    '''29 February gets the day of 1 March in non leap years'''
+    offsets = np.asarray(MONTH_OFFSETS, dtype=np.int64)[months - 1] + days
+    if isleap(year):
+        offsets += months > 2
+    return offsets
+
+
+def days_to_birthdays(months, days, today: date):
+    today_offset = today.timetuple().tm_yday
+    result = day_of_year(months, days, today.year) - today_offset
+    passed = result < 0
+
+    if passed.any():
+        days_in_year = 366 if isleap(today.year) else 365
+        next_year = day_of_year(months[passed], days[passed], today.year + 1)
+        result[passed] = next_year + days_in_year - today_offset
+
+    return result
+
+
+class BirthdayIndex:
+
+    def __init__(self):
+        self.ordinals = []
+        self.days = []
+        self._columns = None
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def add(self, name, birthday: date):
+        insort(self.ordinals, (birthday.toordinal(), name))
+        insort(self.days, (birthday.month, birthday.day, name))
+        self._columns = None
+
+    def add_many(self, items):
+        '''items - (name, birthday) pairs. Appends all and sorts once, insort for every item is quadratic'''
+        for name, birthday in items:
+            self.ordinals.append((birthday.toordinal(), name))
+            self.days.append((birthday.month, birthday.day, name))
+        self.ordinals.sort()
+        self.days.sort()
+        self._columns = None
+
+    def remove(self, name, birthday: date):
+        for items, item in ((self.ordinals, (birthday.toordinal(), name)),
+                            (self.days, (birthday.month, birthday.day, name))):
+            position = bisect_left(items, item)
+            if position < len(items) and items[position] == item:
+                del items[position]
+        self._columns = None
+
+    def columns(self):
+        '''(names, years, months, days), rebuilt only after the index has changed'''
+        if self._columns is None:
+            load_numpy()
+            names = [name for _, name in self.ordinals]
+            self._columns = (names, *birthday_columns([ordinal for ordinal, _ in self.ordinals]))
+        return self._columns
+
+    def soonest(self, today: date, limit: int):
+        '''[(days to birthday, name, age on that birthday)] for the limit soonest birthdays'''
+        if not self.ordinals:
+            return []
+
+        if load_numpy() is None:
+            result = []
+            for ordinal, name in self.ordinals:
+                birthday = date.fromordinal(ordinal)
+                days = days_to_birthday(birthday, today)
+                result.append((days, name, (today + timedelta(days=days)).year - birthday.year))
+            return nsmallest(limit, result)
+
+        names, years, months, days = self.columns()
+        delta = days_to_birthdays(months, days, today)
+
+        if limit < len(delta):
+            # Everybody up to the limit-th soonest birthday, with all ties, so the names decide among them
+            cutoff = np.partition(delta, limit - 1)[limit - 1]
+            positions = np.flatnonzero(delta <= cutoff)
+        else:
+            positions = np.arange(len(delta))
+        positions = np.array([i for _, _, i in sorted((int(delta[i]), names[i], i) for i in positions)[:limit]],
+                             dtype=np.int64)
+
+        birthday_years = today.year + (day_of_year(months[positions], days[positions], today.year)
+                                       < today.timetuple().tm_yday)
+        ages = birthday_years - years[positions]
+        return [(int(delta[i]), names[i], int(age)) for i, age in zip(positions, ages)]
+
+    def born_between(self, start: date, end: date):
+        first = bisect_left(self.ordinals, (start.toordinal(),))
+        last = bisect_left(self.ordinals, (end.toordinal() + 1,))
+        return [name for _, name in self.ordinals[first:last]]
+
+    def age_between(self, min_age: int, max_age: int, today: date):
+        '''Everybody who is min_age..max_age years old (both included) today'''
+        start = date.fromordinal(years_before(today, max_age + 1).toordinal() + 1)
+        end = years_before(today, min_age)
+        return self.born_between(start, end)
+
+    def in_month(self, month: int):
+        first = bisect_left(self.days, (month,))
+        last = bisect_left(self.days, (month + 1,))
+        return [name for _, _, name in self.days[first:last]]
+
+    def upcoming(self, today: date, limit: int):
+        '''[(days to birthday, name)] sorted by the next birthday'''
+        start = (today.month, today.day)
+        if start == (3, 1) and not isleap(today.year):
+            start = (2, 29)
+        position = bisect_left(self.days, start)
+        positions = chain(range(position, len(self.days)), range(position))
+
+        result = []
+        for i in islice(positions, limit):
+            month, day, name = self.days[i]
+            result.append((days_to_birthday(date(2000, month, day), today), name))
+
+        return sorted(result)
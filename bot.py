@@ -1,11 +1,25 @@
 import re
 from datetime import datetime, date
 from collections import UserDict
+import gc
 import json
+import os
+import struct
+import sys
+from functools import wraps
+from itertools import islice
 from json.decoder import JSONDecodeError
+from snapshot import Snapshot, SnapshotFormatError, phone_key, write_snapshot
+from fuzzy_index import DeletionIndex
+from birthday_index import BirthdayIndex, days_to_birthday
+from mail_index import MailIndex
+from storage import STORAGE_COMPRESSION, StorageFormatError, detect_compression, read_rows, write_rows
+from instrumentation import timed
+from query_cache import QueryCache
 
 
 def input_error(func):
+    @wraps(func)
     def inner(*args):
         try:
             return func(*args)
@@ -13,8 +27,10 @@ def input_error(func):
             print("Field name shouldn't be empty!")
         except ContactAlreadyExists:
             print("Contact with this name already exists!")
-        except ContactDoesNotExist:
+        except ContactDoesNotExist as error:
             print("Contact with this name does not exist!")
+            if error.args and error.args[0]:
+                print(f"Did you mean: {', '.join(error.args[0])}?")
         except PhonesDataMissingError:
             print("You haven't provided phones!")
         except EmptySearchQuery:
@@ -29,9 +45,14 @@ def input_error(func):
             print("Incorrent Phone format!")
         except PerpageParameterMissing:
             print("You haven't provided contact number per page!")
+        except IncorrectRangeField:
+            print("Incorrect range parameters!")
+        except IncorrectFormatField:
+            print(f"Output format should be one of: {', '.join(OUTPUT_FORMATS)}!")
     return inner
 
 def date_error(func):
+    @wraps(func)
     def inner(*args):
         try:
             return func(*args)
@@ -40,6 +61,7 @@ def date_error(func):
     return inner
 
 def file_error(func):
+    @wraps(func)
     def inner(*args):
         try:
             return func(*args)
@@ -49,6 +71,56 @@ def file_error(func):
             pass 
     return inner
 
+def storage_error(func):
+    @wraps(func)
+    def inner(book, *args):
+        try:
+            return func(book, *args)
+        except StorageFormatError as error:
+            book.load_error = error
+            print(f"Can't read {book.filename}: {error}")
+            print("Changes will not be saved to this file!")
+    return inner
+
+
+PHONE = r'(?:\+38)?(0\d{2})[- \t]?(\d{3})[- \t]?(\d{2})[- \t]?(\d{2})'
+PHONE_PATTERN = re.compile(PHONE)
+# One phone per line, to validate a batch of phones with one finditer pass
+PHONE_LINES_PATTERN = re.compile(rf'^{PHONE}$', re.M)
+# Older versions saved anything that starts with a phone, e.g. <095-123-45-67,>
+STORED_PHONE_PATTERN = re.compile(r'(?:\+38)?(0\d{2})[-\s]?(\d{3})[-\s]?(\d{2})[-\s]?(\d{2})')
+PHONE_QUERY_PATTERN = re.compile(r'^[\d\s()+-]*\d[\d\s()+-]*$')
+NON_DIGITS_PATTERN = re.compile(r'\D')
+
+
+def normalize_phone(phone):
+    '''Return phone as E.164 digits (380951234567) or None if it is not valid'''
+    match = PHONE_PATTERN.fullmatch(phone.strip())
+    if not match:
+        return None
+    return int('38' + ''.join(match.groups()))
+
+
+def normalize_phones(phones):
+    '''Validate many phones with one regex pass. Return (canonical phones, invalid phones)'''
+    phones = [phone.strip() for phone in phones]
+    text = '\n'.join(phones)
+
+    if '\n' not in ''.join(phones):
+        canonical = [int('38' + ''.join(match.groups())) for match in PHONE_LINES_PATTERN.finditer(text)]
+        if len(canonical) == len(phones):
+            return canonical, []
+
+    canonical = []
+    invalid = []
+    for phone in phones:
+        number = normalize_phone(phone)
+        if number:
+            canonical.append(number)
+        else:
+            invalid.append(phone)
+    return canonical, invalid
+
 
 class EmptyNameField(Exception):
     pass
@@ -88,6 +160,20 @@ class PerpageParameterMissing(Exception):
     pass
 
 
+class IncorrectFormatField(Exception):
+    pass
+
+
+class IncorrectRangeField(Exception):
+    pass
+
+
+MAX_BLOCK_SIZE = 50
+FUZZY_DISTANCE = 2
+OUTPUT_FORMATS = ("table", "json")
+OUTPUT_CHUNK_SIZE = 1000
+
+
 class Field:
 
     def __init__(self):
@@ -114,19 +200,36 @@ class Name(Field):
 class Phone(Field):
 
     def __init__(self, phone):
-        self._value = ''
+        self.canonical = 0
         self.value = phone
 
+    @classmethod
+    def from_canonical(cls, canonical):
+        phone = cls.__new__(cls)
+        phone.canonical = canonical
+        return phone
+
     @property
     def value(self):
-        return self._value
+        return f"+{self.canonical}"
     
     @value.setter
     def value(self, new_value):
-        match = re.match(r'^(\+38)?0\d{2}[-\s]?\d{3}[-\s]?\d{2}[-\s]?\d{2}', new_value)
-        if not match:
+        canonical = normalize_phone(new_value)
+        if not canonical:
             raise IncorrectPhoneField
-        self._value = new_value
+        self.canonical = canonical
+
+    def includes_value(self, value):
+        if not PHONE_QUERY_PATTERN.match(value):
+            return False
+        return NON_DIGITS_PATTERN.sub('', value) in str(self.canonical)
+
+    def __eq__(self, other):
+        return isinstance(other, Phone) and self.canonical == other.canonical
+
+    def __hash__(self):
+        return hash(self.canonical)
 
 
 class Mail(Field):
@@ -162,30 +265,122 @@ class Birthday(Field):
               
 
 class AddressBook(UserDict):
+    filename = "contacts.txt"
+    compression = STORAGE_COMPRESSION
+    storage_keys = ["name", "phones", "mail", "birthday"]
 
-    def __init__(self):
+    def __init__(self, filename=None):
         super().__init__()
-        self.initialize()
+        if filename:
+            self.filename = filename
+        self.snapshot_filename = os.path.splitext(self.filename)[0] + ".snapshot"
+        self._name_index = None
+        self.load_error = None
+        self.birthday_index = BirthdayIndex()
+        self.mail_index = MailIndex()
+        self.version = 0
+        self.cache = QueryCache()
+
+        # Loading creates a few objects per record and no cycles, collector passes only slow it down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.initialize()
+            self.index_records()
+        finally:
+            if gc_enabled:
+                gc.enable()
 
+    @storage_error
     @file_error
     def initialize(self):
 
-        with open("contacts.txt", "r") as fh:
+        if self.snapshot_is_fresh() and self.load_snapshot():
+            return
+
+        compression = detect_compression(self.filename)
+        if compression != "json":
+            for name, phones, mail, birthday in read_rows(self.filename, "contacts", self.storage_keys, compression):
+                self.load_record(name, self.load_phones(name, phones), mail, 
+                                 date.fromordinal(birthday) if birthday else None)
+            return
+
+        with open(self.filename, "r") as fh:
 
             data = json.load(fh)
 
             for name, record in data.items():
 
-                name = Name(name)
-                rec = Record(name)
-                rec.phones = [Phone(phone) for phone in record["phones"]]
-                rec.mail = [Mail(mail) for mail in record["mail"]]
                 birthday = datetime.strptime(record["birthday"], '%d %B %Y').date() if record["birthday"] else None
-                rec.birthday = Birthday(birthday)
-                self.add_record(rec)
+                self.load_record(name, self.load_phones(name, record["phones"]), record["mail"], birthday)
+
+    def load_phones(self, name, phones):
+        phones, skipped = load_phones(phones)
+        for value in skipped:
+            print(f"Skipped invalid phone <{value}> of {name}")
+        return phones
+
+    def snapshot_is_fresh(self):
+        '''The snapshot can replace the store only if it was written after the last save'''
+        try:
+            return os.stat(self.snapshot_filename).st_mtime_ns > os.stat(self.filename).st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def load_snapshot(self):
+        '''Load records from the snapshot: phones are already canonical and birthdays are ordinals, 
+        so there is no JSON parsing, phone validation or date parsing. Return False if it can't be read'''
+        try:
+            with Snapshot(self.snapshot_filename) as snapshot:
+                for name, phones, mail, birthday in snapshot:
+                    self.load_record(name, [Phone.from_canonical(phone_key(phone)) for phone in phones], mail, birthday)
+        except (SnapshotFormatError, struct.error, ValueError):
+            self.data.clear()
+            return False
+        return True
+
+    def load_record(self, name, phones, mail, birthday):
+        '''Loaded records are indexed in bulk by index_records'''
+        rec = Record(Name(name))
+        rec.phones = phones
+        rec.mail = Mail(mail)
+        rec.birthday = Birthday(birthday)
+        self.data[name] = rec
 
+    @property
+    def name_index(self):
+        '''Built on the first fuzzy lookup or suggestion, so loading the book does not pay for it'''
+        if self._name_index is None:
+            self._name_index = DeletionIndex(FUZZY_DISTANCE)
+            for name in self.data:
+                self._name_index.add(name)
+        return self._name_index
+
+    def index_records(self):
+        self.birthday_index.add_many((record.name.value, record.birthday.value) 
+                                     for record in self.data.values() if record.has_birthday())
+        self.mail_index.add_many((record.name.value, record.mail.value) 
+                                 for record in self.data.values() if record.has_mail())
+        self.version += 1
+
+    @timed("persist")
     def save_data(self):
-        with open("contacts.txt", "w") as fh:
+        if self.load_error:
+            return
+        self.write_file(self.filename, self.compression)
+
+    def write_file(self, filename, compression="json"):
+
+        if compression != "json":
+            write_rows(filename, "contacts", self.storage_keys, 
+                       ([record.name.value, 
+                         [i.value for i in record.phones], 
+                         record.mail.value if record.mail.value else None,
+                         record.birthday.value.toordinal() if record.birthday.value else None] 
+                        for record in self.data.values()), compression)
+            return
+
+        with open(filename, "w") as fh:
 
             data = {record.name.value: {"phones": [i.value for i in record.phones], 
                                     "mail": record.mail.value if record.mail.value else None,
@@ -193,50 +388,195 @@ class AddressBook(UserDict):
                                     for record in self.data.values()}
             json.dump(data, fh)
 
-    def show_all_contacts(self):
-        return self.format_records(self.data.values())   
+    def save_snapshot(self, path=None):
+        write_snapshot(((record.name.value, 
+                         [i.value for i in record.phones], 
+                         record.mail.value, 
+                         record.birthday.value) 
+                        for record in self.data.values()), path or self.snapshot_filename)
+        return len(self.data)
+
+    def refresh_snapshot(self):
+        '''Write the snapshot again if the store was saved after it, so the next start can load from it'''
+        if not self.load_error and os.path.exists(self.filename) and not self.snapshot_is_fresh():
+            self.save_snapshot()
+
+    def write_records(self, data, output_format="table", out=None):
+        '''Stream rendered records to out (stdout by default) in chunks of OUTPUT_CHUNK_SIZE lines'''
+        out = out or sys.stdout
+        separator = ",\n" if output_format == "json" else "\n"
+        records = iter(data)
+        written = 0
+
+        if output_format == "json":
+            out.write("[\n")
+
+        while True:
+            chunk = [record.render(output_format) for record in islice(records, OUTPUT_CHUNK_SIZE)]
+            if not chunk:
+                break
+            if written:
+                out.write(separator)
+            out.write(separator.join(chunk))
+            written += len(chunk)
+
+        if output_format == "json":
+            out.write("\n]")
+        out.write("\n")
+        out.flush()
+        return written
     
     def add_record(self, record):
+        if record.name.value in self.data:
+            self.unindex_birthday(self.data[record.name.value])
+            self.unindex_mail(self.data[record.name.value])
+        elif self._name_index is not None:
+            self._name_index.add(record.name.value)
         self.data[record.name.value] = record
+        self.index_birthday(record)
+        self.index_mail(record)
+        self.version += 1
         
+    def search(self, query):
+        names = self.cache.get((self.version, query))
+        if names is None:
+            if query.startswith("mail:"):
+                names = self.find_by_mail(query[len("mail:"):])
+            else:
+                names = [record.name.value for record in self.data.values() if record.find_coincidence(query)]
+            self.cache.put((self.version, query), names)
+        return [self.data[name] for name in names]
+
     def find_records(self, query):
-        result = [record for record in self.data.values() if record.find_coincidence(query)]
-        return self.format_records(result)
+        return self.format_records(self.search(query))
         
     def delete_record(self, name): 
-        self.data.pop(name)
+        record = self.data.pop(name)
+        if self._name_index is not None:
+            self._name_index.remove(name)
+        self.unindex_birthday(record)
+        self.unindex_mail(record)
+        self.version += 1
+
+    def index_mail(self, record):
+        if record.mail and record.mail.value:
+            self.mail_index.add(record.name.value, record.mail.value)
+
+    def unindex_mail(self, record):
+        if record.mail and record.mail.value:
+            self.mail_index.remove(record.name.value, record.mail.value)
+
+    def find_by_mail(self, mail):
+        '''<user@example.com> finds the exact mail, <@example.com> the whole domain with subdomains'''
+        if mail.startswith("@"):
+            return self.mail_index.find_domain(mail)
+        return self.mail_index.find(mail)
+
+    def index_birthday(self, record):
+        if record.birthday and record.birthday.value:
+            self.birthday_index.add(record.name.value, record.birthday.value)
+
+    def unindex_birthday(self, record):
+        if record.birthday and record.birthday.value:
+            self.birthday_index.remove(record.name.value, record.birthday.value)
+
+    def update_phones(self, record, phones):
+        record.update(phones)
+        self.version += 1
+
+    def update_birthday(self, record, birthday):
+        self.unindex_birthday(record)
+        try:
+            record.update_birthday(birthday)
+        finally:
+            self.index_birthday(record)
+            self.version += 1
+
+    def update_mail(self, record, mail):
+        self.unindex_mail(record)
+        record.update_mail(mail)
+        self.index_mail(record)
+        self.version += 1
+
+    def born_between(self, start, end):
+        return [self.data[name] for name in self.birthday_index.born_between(start, end)]
+
+    def age_between(self, min_age, max_age):
+        return [self.data[name] for name in self.birthday_index.age_between(min_age, max_age, date.today())]
+
+    def birthdays_in_month(self, month):
+        return [self.data[name] for name in self.birthday_index.in_month(month)]
+
+    def upcoming_birthdays(self, limit):
+        return [(days, self.data[name]) for days, name in self.birthday_index.upcoming(date.today(), limit)]
+
+    def birthday_report(self, limit):
+        '''Batch report over the whole book: [(days to birthday, record, age on that birthday)]'''
+        return [(days, self.data[name], age) for days, name, age in self.birthday_index.soonest(date.today(), limit)]
 
     def get_record_by_name(self, name):
         return self.data.get(name, None)
 
+    def fuzzy_search(self, name, max_distance=FUZZY_DISTANCE):
+        return [self.data[match] for _, match in self.name_index.search(name, max_distance)]
+
+    def suggest_names(self, name, limit=3):
+        return [match for _, match in self.name_index.search(name, FUZZY_DISTANCE) if match != name][:limit]
+
     def format_records(self, data):
 
         if data:
-            return '\n'.join([f"Name: {record.name.value} | "
-                              f"phones: {', '.join([i.value for i in record.phones]) if record.phones else '-'} | "
-                              f"mail: {record.mail.value} | "
-                              f"birthday: {record.birthday.value if record.birthday.value else '-'}"
-                              for record in data])
+            return '\n'.join([record.render() for record in data])
         return None
     
+    def find_duplicates(self):
+        '''Group records by blocking keys and score only the pairs inside one block'''
+        blocks = {}
+        for record in self.data.values():
+            for key in record.blocking_keys():
+                blocks.setdefault(key, []).append(record)
+
+        pairs = {}
+        for block in blocks.values():
+            if len(block) < 2 or len(block) > MAX_BLOCK_SIZE:
+                continue
+
+            for i, first in enumerate(block):
+                for second in block[i + 1:]:
+                    pair = tuple(sorted((first.name.value, second.name.value)))
+                    if pair not in pairs:
+                        pairs[pair] = first.similarity(second)
+
+        return sorted(((first, second, score) for (first, second), score in pairs.items()), 
+                      key=lambda x: x[2], reverse=True)
+
+    def merge_records(self, name, duplicate_name):
+        record = self.data[name]
+        duplicate = self.data[duplicate_name]
+        self.delete_record(duplicate_name)
+
+        record.phones = record.phones + [i for i in duplicate.phones if i not in record.phones]
+        if not record.has_mail() and duplicate.has_mail():
+            record.mail = duplicate.mail
+            self.index_mail(record)
+        if not record.has_birthday() and duplicate.has_birthday():
+            record.birthday = duplicate.birthday
+            self.index_birthday(record)
+        record.invalidate()
+        self.version += 1
+
     def iterator(self, per_page):
-        current_value = 0
+        records = iter(self.data.values())
         page = 1
-        count = []
-
-
-        while current_value < len(self.data.values()):
 
-            count.append(list(self.data.values())[current_value])
+        while True:
+            count = list(islice(records, per_page))
+            if not count:
+                break
 
-            if len(count) == per_page or current_value == len(self.data.values()) - 1:
-
-                print(f"PAGE {page}: ")
-                page += 1
-                yield self.format_records(count)
-                count = []
-            
-            current_value += 1
+            print(f"PAGE {page}: ")
+            page += 1
+            yield self.format_records(count)
 
 
 class Record:
@@ -246,6 +586,7 @@ class Record:
 
     def __init__(self, name):
         self.name = name
+        self._rendered = {}
 
     def has_mail(self):
         if self.mail.value:
@@ -262,49 +603,152 @@ class Record:
     
     def find_coincidence(self, value):
         result = (self.name.includes_value(value) or 
-                  list(filter(lambda x: x.includes_value(value), self.phones)))
+                  list(filter(lambda x: x.includes_value(value), self.phones)) or
+                  (self.has_mail() and self.mail.includes_value(value)))
         return result
 
     def update(self, phones):
         self.phones = phones
+        self.invalidate()
+
+    def update_birthday(self, birthday):
+        self.birthday.value = birthday
+        self.invalidate()
+
+    def update_mail(self, mail):
+        self.mail.value = mail
+        self.invalidate()
+
+    def invalidate(self):
+        self._rendered.clear()
+
+    def render(self, output_format="table"):
+        line = self._rendered.get(output_format)
+        if line is None:
+            if output_format == "json":
+                line = json.dumps({"name": self.name.value,
+                                   "phones": [i.value for i in self.phones],
+                                   "mail": self.mail.value,
+                                   "birthday": self.birthday.value.isoformat() if self.birthday.value else None})
+            else:
+                line = (f"Name: {self.name.value} | "
+                        f"phones: {', '.join([i.value for i in self.phones]) if self.phones else '-'} | "
+                        f"mail: {self.mail.value} | "
+                        f"birthday: {self.birthday.value if self.birthday.value else '-'}")
+            self._rendered[output_format] = line
+        return line
+
+    def blocking_keys(self):
+        keys = [("name", self.name.value.strip().lower())]
+        keys.extend(("phone", phone.canonical) for phone in self.phones)
+        if self.mail and self.mail.value:
+            keys.append(("mail", self.mail.value.strip().lower()))
+        return keys
+
+    def similarity(self, other):
+        score = 0
+        if self.name.value.strip().lower() == other.name.value.strip().lower():
+            score += 0.5
+        if set(self.phones) & set(other.phones):
+            score += 0.3
+        if self.has_mail() and other.has_mail() and \
+                self.mail.value.strip().lower() == other.mail.value.strip().lower():
+            score += 0.2
+        return round(score, 2)
 
     def get_days_to_birthday(self):
         
         if self.birthday.value:
-            today = date.today() 
-            birthday_this_year = date(year=today.year, month=self.birthday.value.month, day=self.birthday.value.day)
-            print("birthday_this_year", birthday_this_year)
-            delta = birthday_this_year - today 
-
-            if birthday_this_year > today :
-                return delta.days
-            
-            birthday_next_year = date(year=today.year+1, month=self.birthday.value.month, day=self.birthday.value.day)
-            delta = birthday_next_year - today 
-            return delta.days
+            return days_to_birthday(self.birthday.value, date.today())
         
         return None
 
 
+def load_phones(data):
+    '''Phones read from the store. Return (phones, values that are not phones at all)'''
+    if not data:
+        return [], []
+
+    canonical, invalid = normalize_phones(data)
+    skipped = []
+    if invalid:
+        canonical = []
+        for value in data:
+            match = STORED_PHONE_PATTERN.match(value.strip())
+            if match:
+                canonical.append(int('38' + ''.join(match.groups())))
+            else:
+                skipped.append(value)
+    return [Phone.from_canonical(number) for number in dict.fromkeys(canonical)], skipped
+
+
 def format_phones_to_list(data):
-    return list(map(lambda x: Phone(x.strip()), data)) if data else []
+    if not data:
+        return []
 
+    canonical, invalid = normalize_phones(data)
+    if invalid:
+        raise IncorrectPhoneField
+    return [Phone.from_canonical(number) for number in dict.fromkeys(canonical)]
 
-def show_all_contacts(address_book, *args):
-    result = address_book.show_all_contacts()
-    if result:
-        return result
-    return "There are no contacts!"
 
+def get_output_format(params):
+    '''Split <--format json|table> out of command params'''
+    if "--format" not in params:
+        return "table", params
+
+    position = params.index("--format")
+    output_format = params[position + 1] if len(params) > position + 1 else None
+    if output_format not in OUTPUT_FORMATS:
+        raise IncorrectFormatField
+    return output_format, params[:position] + params[position + 2:]
+
+
+@input_error
+def show_all_contacts(address_book, params):
+    output_format, _ = get_output_format(params)
+
+    if not address_book.data:
+        return "There are no contacts!"
+    address_book.write_records(address_book.data.values(), output_format)
+
+
+@input_error
 def find_records(address_book, params):
+    output_format, params = get_output_format(params)
 
     if not params:
         raise EmptySearchQuery
 
     query = params[0]
-    result = address_book.find_records(query)
+    result = address_book.search(query)
+
+    if result:
+        address_book.write_records(result, output_format)
+        return None
+
+    suggestions = address_book.suggest_names(query)
+    if suggestions:
+        return f"Nothing found! Did you mean: {', '.join(suggestions)}?"
+    return "Nothing found!"
 
-    return result if result else "Nothing found!"
+
+@input_error
+def fuzzy_search(address_book, params):
+
+    if not params:
+        raise EmptySearchQuery
+
+    name = params[0]
+    max_distance = int(params[1]) if len(params) > 1 and params[1].isdigit() else FUZZY_DISTANCE
+    note = ""
+    if max_distance > FUZZY_DISTANCE:
+        # The deletion index holds variants only up to FUZZY_DISTANCE
+        note = f"Distance is limited to {FUZZY_DISTANCE}, showing names within {FUZZY_DISTANCE}.\n"
+        max_distance = FUZZY_DISTANCE
+    result = address_book.format_records(address_book.fuzzy_search(name, max_distance))
+
+    return note + (result if result else "Nothing found!")
 
 @input_error
 def add_record(address_book, params):
@@ -346,7 +790,7 @@ def delete_record(address_book, params):
     contact = address_book.get_record_by_name(name)
 
     if not contact:
-        raise ContactDoesNotExist
+        raise ContactDoesNotExist(address_book.suggest_names(name))
 
     address_book.delete_record(name)
     address_book.save_data()
@@ -363,7 +807,7 @@ def update(address_book, params):
     record = address_book.get_record_by_name(name)
 
     if not record:
-        raise ContactDoesNotExist
+        raise ContactDoesNotExist(address_book.suggest_names(name))
     
     if len(params) == 1:
         raise PhonesDataMissingError
@@ -373,7 +817,7 @@ def update(address_book, params):
 
     phones = format_phones_to_list(phones)
      
-    record.update(phones)
+    address_book.update_phones(record, phones)
     address_book.save_data()
     return f"Field <phones> for record with name {name} updated!"
 
@@ -388,13 +832,13 @@ def update_birthday(address_book, params):
     contact = address_book.get_record_by_name(name)
 
     if not contact:
-        raise ContactDoesNotExist
+        raise ContactDoesNotExist(address_book.suggest_names(name))
     
     if len(params) < 2:
         raise EmptyBirthdayField
     
     birthday = params[1]
-    contact.birthday.value = birthday
+    address_book.update_birthday(contact, birthday)
     address_book.save_data()
 
     return f"Field <birthday> for record with name {name} updated!"
@@ -410,13 +854,13 @@ def update_mail(address_book, params):
     contact = address_book.get_record_by_name(name)
 
     if not contact:
-        raise ContactDoesNotExist
+        raise ContactDoesNotExist(address_book.suggest_names(name))
     
     if len(params) < 2:
         raise EmptyMailField
     
     mail = params[1]
-    contact.mail.value = mail
+    address_book.update_mail(contact, mail)
     address_book.save_data()
 
     return f"Field <mail> for record with name {name} updated!"
@@ -431,7 +875,7 @@ def check_birthday(address_book, params):
     contact = address_book.get_record_by_name(name)
 
     if not contact:
-        raise ContactDoesNotExist
+        raise ContactDoesNotExist(address_book.suggest_names(name))
     
     has_birthday = contact.has_birthday()
     if has_birthday:
@@ -453,6 +897,98 @@ def iterator(address_book, params):
         print(i)
 
 
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").date()
+    except ValueError:
+        raise IncorrectDateField
+
+
+@input_error
+def born_between(address_book, params):
+
+    if len(params) < 2:
+        raise EmptyBirthdayField
+
+    result = address_book.format_records(address_book.born_between(parse_date(params[0]), parse_date(params[1])))
+    return result if result else "Nothing found!"
+
+
+@input_error
+def age_between(address_book, params):
+
+    if not params or not all(i.isdigit() for i in params[:2]):
+        raise IncorrectRangeField
+
+    min_age = int(params[0])
+    max_age = int(params[1]) if len(params) > 1 else min_age
+    result = address_book.format_records(address_book.age_between(min_age, max_age))
+    return result if result else "Nothing found!"
+
+
+@input_error
+def birthdays_in_month(address_book, params):
+
+    if not params or not params[0].isdigit() or not 1 <= int(params[0]) <= 12:
+        raise IncorrectRangeField
+
+    result = address_book.format_records(address_book.birthdays_in_month(int(params[0])))
+    return result if result else "Nothing found!"
+
+
+@input_error
+def upcoming_birthdays(address_book, params):
+
+    if params and not params[0].isdigit():
+        raise IncorrectRangeField
+
+    limit = int(params[0]) if params else 10
+    result = '\n'.join(f"{days} days: {record.render()}" for days, record in address_book.upcoming_birthdays(limit))
+    return result if result else "There are no birthdays!"
+
+
+@input_error
+def birthday_reminders(address_book, params):
+
+    if params and not params[0].isdigit():
+        raise IncorrectRangeField
+
+    limit = int(params[0]) if params else 10
+    result = '\n'.join(f"In {days} days {record.name.value} turns {age}" 
+                       for days, record, age in address_book.birthday_report(limit))
+    return result if result else "There are no birthdays!"
+
+
+def dedupe(address_book, *args):
+    candidates = address_book.find_duplicates()
+
+    if not candidates:
+        return "No duplicates found!"
+
+    merged = 0
+    for name, duplicate_name, score in candidates:
+        if name not in address_book.data or duplicate_name not in address_book.data:
+            continue
+
+        answer = input(f"Merge <{duplicate_name}> into <{name}> (score {score})? y/n: ").strip().lower()
+        if answer == "y":
+            address_book.merge_records(name, duplicate_name)
+            merged += 1
+
+    if merged:
+        address_book.save_data()
+    return f"Merged {merged} contacts!"
+
+
+def cache_stats(address_book, *args):
+    return address_book.cache.stats()
+
+
+def save_snapshot(address_book, *args):
+    count = address_book.save_snapshot()
+    return f"Snapshot with {count} contacts saved!"
+
+
 actions = {
     "show all": show_all_contacts,
     "update birthday": update_birthday,
@@ -462,5 +998,14 @@ actions = {
     "mail": update_mail,
     "delete": delete_record,
     "check birthday": check_birthday,
-    "iterator": iterator
+    "iterator": iterator,
+    "snapshot": save_snapshot,
+    "dedupe": dedupe,
+    "fuzzy": fuzzy_search,
+    "born": born_between,
+    "age": age_between,
+    "birthdays": birthdays_in_month,
+    "upcoming": upcoming_birthdays,
+    "reminders": birthday_reminders,
+    "cache": cache_stats
 }
@@ -0,0 +1,111 @@
+'''SymSpell style deletion index for typo tolerant name lookup.
+
+Every word is stored under all its variants with up to max_distance deleted
+characters. Two words are within distance d only if they share such a variant,
+so a lookup generates the deletes of the query, takes the words stored under
+them and checks the edit distance only for those few candidates.
+
+Only the first prefix_length characters are used for the deletes, as in
+SymSpell, this keeps the number of variants per word small. A variant that
+belongs to one word keeps the word itself instead of a set.
+'''
+
+
+def levenshtein(first: str, second: str) -> int:
+    if len(first) < len(second):
+        first, second = second, first
+
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (first_char != second_char)))
+        previous = current
+
+    return previous[-1]
+
+
+def deletes(word: str, max_distance: int) -> set:
+    result = {word}
+    edge = {word}
+
+    for _ in range(max_distance):
+        edge = {item[:i] + item[i + 1:] for item in edge for i in range(len(item))}
+        result |= edge
+
+    return result
+
+
+class DeletionIndex:
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.variants = {}
+        self.words = {}
+
+    def __len__(self):
+        return sum(len(words) for words in self.words.values())
+
+    def add(self, word):
+        key = word.lower()
+
+        if key not in self.words:
+            self.words[key] = set()
+            for variant in deletes(key[:self.prefix_length], self.max_distance):
+                keys = self.variants.get(variant)
+                if keys is None:
+                    self.variants[variant] = key
+                elif isinstance(keys, str):
+                    self.variants[variant] = {keys, key}
+                else:
+                    keys.add(key)
+
+        self.words[key].add(word)
+
+    def remove(self, word):
+        key = word.lower()
+        words = self.words.get(key)
+        if not words:
+            return
+
+        words.discard(word)
+        if words:
+            return
+
+        del self.words[key]
+        for variant in deletes(key[:self.prefix_length], self.max_distance):
+            keys = self.variants.get(variant)
+            if keys == key:
+                del self.variants[variant]
+            elif isinstance(keys, set):
+                keys.discard(key)
+                if len(keys) == 1:
+                    self.variants[variant] = keys.pop()
+
+    def search(self, word, max_distance=None):
+        '''Return [(distance, word)] sorted by distance, max_distance can't be above the one of the index'''
+
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        query = word.lower()
+        candidates = set()
+        for variant in deletes(query[:self.prefix_length], max_distance):
+            keys = self.variants.get(variant)
+            if isinstance(keys, str):
+                candidates.add(keys)
+            elif keys:
+                candidates |= keys
+
+        result = []
+        for key in candidates:
+            if abs(len(key) - len(query)) > max_distance:
+                continue
+            distance = levenshtein(query, key)
+            if distance <= max_distance:
+                result.extend((distance, name) for name in self.words[key])
+
+        return sorted(result)
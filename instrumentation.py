@@ -0,0 +1,183 @@
+'''Per-command latency statistics for the REPL dispatch.
+
+Every command is split into phases: parse (finding the handler), execute
+(the handler itself) and persist (saving to file). Time of a nested phase
+is not counted in its parent, so execute does not include persist.
+
+Profiling is switched on with BOT_PROFILE=cprofile|tracemalloc or with the
+<profile cprofile|tracemalloc|off> command, results are printed by <stats>.
+'''
+
+import io
+import math
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+BUCKETS_PER_OCTAVE = 4
+
+
+class LatencyHistogram:
+    '''Log-scale histogram, percentiles are precise to one bucket (~19%)'''
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, seconds):
+        micros = max(seconds * 1_000_000, 1)
+        bucket = int(math.log2(micros) * BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        '''Upper bound of the bucket that holds the percentile, in seconds'''
+        if not self.count:
+            return 0
+
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1_000_000, self.max)
+        return self.max
+
+
+class CommandStats:
+
+    def __init__(self):
+        self.histograms = {}
+        self.command_name = None
+        self.stack = []
+        self.profiler = None
+        self.profile_mode = None
+
+    @contextmanager
+    def command(self, name):
+        self.command_name = name
+        try:
+            yield
+        finally:
+            self.command_name = None
+
+    def record(self, command, phase, seconds):
+        self.histograms.setdefault((command, phase), LatencyHistogram()).add(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        if self.command_name is None:
+            yield
+            return
+
+        frame = [0]
+        self.stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][0] += elapsed
+            self.record(self.command_name, name, elapsed - frame[0])
+
+    def start_profile(self, mode):
+        self.stop_profile()
+
+        if mode == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+        elif mode == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start()
+        self.profile_mode = mode
+
+    def stop_profile(self):
+        if self.profile_mode == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.stop()
+        self.profiler = None
+        self.profile_mode = None
+
+    @contextmanager
+    def profile(self):
+        if self.profiler is None:
+            yield
+            return
+
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def report(self):
+        if not self.histograms:
+            return 'No commands measured yet!'
+
+        lines = [f"{'command':<20} {'phase':<8} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        for (command, phase), histogram in sorted(self.histograms.items()):
+            lines.append(f"{command:<20} {phase:<8} {histogram.count:>6} "
+                         f"{histogram.percentile(50) * 1000:>9.3f} "
+                         f"{histogram.percentile(95) * 1000:>9.3f} "
+                         f"{histogram.percentile(99) * 1000:>9.3f}")
+
+        if self.profiler is not None:
+            import pstats
+            output = io.StringIO()
+            pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(10)
+            lines.append(output.getvalue())
+        elif self.profile_mode == 'tracemalloc':
+            import tracemalloc
+            lines.append('Top allocations:')
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:10]:
+                lines.append(f"  {stat}")
+
+        return '\n'.join(lines)
+
+
+stats = CommandStats()
+
+if os.environ.get('BOT_PROFILE') in PROFILE_MODES:
+    stats.start_profile(os.environ['BOT_PROFILE'])
+
+
+def timed(phase):
+    '''Decorator, time the function as a phase of the current command'''
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with stats.phase(phase):
+                return func(*args, **kwargs)
+        return inner
+    return decorator
+
+
+def show_stats(*args):
+    return stats.report()
+
+
+def toggle_profile(*args):
+    params = args[1] if len(args) > 1 and args[1] else []
+    mode = params[0] if params else None
+
+    if mode in PROFILE_MODES:
+        stats.start_profile(mode)
+        return f"Profiling with {mode} is on!"
+
+    stats.stop_profile()
+    return "Profiling is off!"
+
+
+actions = {
+    "stats": show_stats,
+    "profile": toggle_profile
+}
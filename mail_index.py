@@ -0,0 +1,70 @@
+'''Mail lookups for the address book.
+
+by_mail maps a normalized mail to the names of its contacts, so finding a
+contact by mail is one dict lookup. domains is a sorted list of
+(reversed domain, name): "mail.example.com" is kept as "com.example.mail",
+so a domain and all its subdomains sit next to each other and one bisect
+finds them, the cost depends only on the number of results.
+'''
+
+from bisect import bisect_left, insort
+
+
+def normalize_mail(mail: str) -> str:
+    return mail.strip().lower()
+
+
+def reversed_domain(domain: str) -> str:
+    return '.'.join(reversed(domain.strip('@. ').lower().split('.')))
+
+
+class MailIndex:
+
+    def __init__(self):
+        self.by_mail = {}
+        self.domains = []
+
+    def __len__(self):
+        return len(self.domains)
+
+    def add(self, name, mail):
+        key = normalize_mail(mail)
+        self.by_mail.setdefault(key, set()).add(name)
+        insort(self.domains, (reversed_domain(key.rpartition('@')[2]), name))
+
+    def add_many(self, items):
+        '''items - (name, mail) pairs, domains are sorted once instead of insort for every item'''
+        for name, mail in items:
+            key = normalize_mail(mail)
+            self.by_mail.setdefault(key, set()).add(name)
+            self.domains.append((reversed_domain(key.rpartition('@')[2]), name))
+        self.domains.sort()
+
+    def remove(self, name, mail):
+        key = normalize_mail(mail)
+        names = self.by_mail.get(key)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self.by_mail[key]
+
+        item = (reversed_domain(key.rpartition('@')[2]), name)
+        position = bisect_left(self.domains, item)
+        if position < len(self.domains) and self.domains[position] == item:
+            del self.domains[position]
+
+    def find(self, mail):
+        return sorted(self.by_mail.get(normalize_mail(mail), ()))
+
+    def find_domain(self, domain):
+        '''Names with mail in the domain or any of its subdomains'''
+        key = reversed_domain(domain)
+        if not key:
+            return []
+
+        result = []
+        for first, last in ((key, key + '\x00'), (key + '.', key + '/')):
+            start = bisect_left(self.domains, (first,))
+            end = bisect_left(self.domains, (last,))
+            result.extend(name for _, name in self.domains[start:end])
+        return result
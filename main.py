@@ -1,7 +1,11 @@
-from bot import AddressBook, actions as contacts_actions
-from note import NoteBook, choices as notebook_actions
-from sorter import sorter
+from instrumentation import stats, show_stats, actions as instrumentation_actions
 from abc import ABC, abstractmethod
+import os
+import time
+
+
+# Books stay loaded for the whole process: {file name: [file mtime, book]}
+books = {}
 
 class Info(ABC):
     
@@ -13,27 +17,37 @@ class Info(ABC):
 class MainMenu(Info):
     def info(self):
         print('Main menu')
-        print('Choose command: <contacts>, <notebook> or <files>. Or <exit> to quit bot.')
+        print('Choose command: <contacts>, <notebook>, <files> or <stats>. Or <exit> to quit bot.')
 
 
 class AddressBookMenu(Info):
 
     def info(self):
-        print("Choose command: <show all>, <add>, <update>, <mail>, <update birthday>, <check birthday>, <iterator>, <find>, <delete> or <up> to get back to main menu.")
+        print("Choose command: <show all>, <add>, <update>, <mail>, <update birthday>, <check birthday>, <iterator>, <find>, <fuzzy>, <snapshot>, <dedupe>, <delete>, <cache>, <stats>, <profile> or <up> to get back to main menu.")
         print("Phone should be in format <095-123-45-67> or <095 123 45 67>")
         print("Date should be in format <01.01.2000>")
+        print("Add <--format json> to <show all> or <find> to get contacts as json")
+        print("Search by mail: <find mail:user@example.com> or <find mail:@example.com>")
+        print("Birthday reports: <born 01.01.1990 31.12.1999>, <age 18 30>, <birthdays 5>, <upcoming 10>, <reminders 10>")
+
+
+class ShardedAddressBookMenu(Info):
+
+    def info(self):
+        print(f"Sharded contacts, {os.environ.get('BOT_SHARDS')} shards.")
+        print("Choose command: <add>, <find>, <delete>, <reminders>, <count>, <stats>, <profile> or <up> to get back to main menu.")
 
 
 class NoteBookMenu(Info):
 
     def info(self):
-        print("Choose command: <add note>, <show notes>, <add tag>, <remove note> or <note>.")
+        print("Choose command: <add note>, <show notes>, <add tag>, <remove note>, <note>, <note history>, <note at>, <cache>, <stats> or <profile>.")
 
 
 class SorterMenu(Info):
 
     def info(self):
-        print("Enter to sorting or input command <up> to back to main menu!")
+        print("Enter to sorting, <watch> to sort new files as they arrive or input command <up> to back to main menu!")
 
 
 
@@ -53,10 +67,48 @@ def close(*args):
     return "Good bye!"
 
 
+def get_mtime(filename):
+    try:
+        return os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_book(filename, factory):
+    '''Return the cached book, read the file again only if it was changed outside of the bot'''
+    cached = books.get(filename)
+    mtime = get_mtime(filename)
+
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    book = factory()
+    books[filename] = [mtime, book]
+    return book
+
+
+def remember_book(filename):
+    '''Our own saves change the mtime too, remember it so the next entry reuses the book'''
+    if filename in books:
+        books[filename][0] = get_mtime(filename)
+
+
+def load_notebook():
+    from note import NoteBook
+
+    notebook = NoteBook()
+    notebook.recover_from_file()
+    return notebook
+
+
 def initialize_addressbook():
+    if os.environ.get("BOT_SHARDS", "").isdigit():
+        return initialize_sharded_addressbook()
+
+    from bot import AddressBook, actions as contacts_actions
 
     # commands_completer = get_commands_from_actions(contacts_actions)
-    address_book = AddressBook()
+    address_book = load_book(AddressBook.filename, AddressBook)
     client(AddressBookMenu())
     # addressbook_commands = {
     #     "show all": None,
@@ -73,7 +125,7 @@ def initialize_addressbook():
 
     # completer = NestedCompleter.from_nested_dict(addressbook_commands)
 
-    # print("Choose command: <show all>, <add>, <update>, <mail>, <update birthday>, <check birthday>, <iterator>, <find>, <delete> or <up> to get back to menu.")
+    # print("Choose command: <show all>, <add>, <update>, <mail>, <update birthday>, <check birthday>, <iterator>, <find>, <snapshot>, <delete> or <up> to get back to menu.")
     # print("Phone should be in format <095-123-45-67> or <095 123 45 67>")
     # print("Date should be in format <01.01.2000>")
 
@@ -83,11 +135,31 @@ def initialize_addressbook():
 
         # command = prompt('Type command >>>>> ', completer=completer).strip()
         command = input('Type command >>>>> ').strip()
-        handler_response = handler(command, contacts_actions)
-        func = handler_response[0]
-        args = handler_response[1]
+        result = dispatch(command, contacts_actions, address_book)
 
-        result = func(address_book, args)
+        if command in ["up"]:
+            print("Now you are back to main menu!")
+            address_book.refresh_snapshot()
+            remember_book(AddressBook.filename)
+            break
+
+        if result:
+            print(result)
+
+
+def initialize_sharded_addressbook():
+    from sharding import open_sharded_book, actions as sharded_actions
+
+    # Shard processes stay alive for the whole session
+    if "shards" not in books:
+        books["shards"] = [None, open_sharded_book(int(os.environ["BOT_SHARDS"]) or None)]
+    address_book = books["shards"][1]
+    client(ShardedAddressBookMenu())
+
+    while True:
+        print("-" * 50)
+        command = input('Type command >>>>> ').strip()
+        result = dispatch(command, sharded_actions, address_book)
 
         if command in ["up"]:
             print("Now you are back to main menu!")
@@ -98,9 +170,9 @@ def initialize_addressbook():
 
 
 def initialize_notebook():
+    from note import NoteBook, choices as notebook_actions
 
-    notebook = NoteBook()
-    notebook.recover_from_file()
+    notebook = load_book(NoteBook.storage_file(), load_notebook)
     client(NoteBookMenu())
     # notebook_commands = {
     #     "add note": None,
@@ -119,15 +191,12 @@ def initialize_notebook():
         print("-" * 50)
         command = input("Type command >>>>> ").strip()
 
-        handler_response = handler(command, notebook_actions)
-        func = handler_response[0]
-        args = handler_response[1]
-
-        result = func(notebook, args)
+        result = dispatch(command, notebook_actions, notebook)
 
         if command in ["up"]:
             print("Now you are back to main menu!")
             notebook.save_to_file()
+            remember_book(NoteBook.storage_file())
             break
 
         if result:
@@ -135,6 +204,7 @@ def initialize_notebook():
 
 
 def start_work_with_files():
+    from sorter import sorter
 
     client(SorterMenu())
     # print("Enter to sorting or input command <up> to back to main menu!")
@@ -146,6 +216,13 @@ def start_work_with_files():
         if command in ["up"]:
             print("Now you are back to main menu!")
             break
+
+        if command in ["watch"]:
+            from watcher import watch
+
+            print('Please write path of the folder to watch, press Ctrl+C to stop watching')
+            print(watch(input('>>> ')))
+            continue
         
         sorter()
 
@@ -157,6 +234,7 @@ choices = {
     "close": close,
     "exit": close,
     "good bye": close,
+    "stats": show_stats,
 }
 
 
@@ -174,13 +252,27 @@ def handler(string, actions):
     command = string.lower()
 
     for action, func in actions.items():
-        if command.startswith(action):
+        # Whole words only, so <note atlas> is not taken for <note at>
+        if command.startswith(action) and command[len(action):len(action) + 1] in ("", " "):
             args = string[len(action):].strip().split(' ')
             args = list(filter(lambda x: x.strip() if x else None, args))
             return func, args
     return incorrect_command, None
 
 
+def dispatch(string, actions, book):
+    start = time.perf_counter()
+    func, args = handler(string, instrumentation_actions)
+    if func is incorrect_command:
+        func, args = handler(string, actions)
+    parsed = time.perf_counter()
+
+    with stats.command(func.__name__):
+        stats.record(func.__name__, 'parse', parsed - start)
+        with stats.phase('execute'), stats.profile():
+            return func(book, args)
+
+
 def main():
 
     # commands = {
@@ -204,6 +296,8 @@ def main():
             print(result)
 
         if command in ["close", "exit", "good bye"]:
+            if "shards" in books:
+                books["shards"][1].close()
             break
 
 
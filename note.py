@@ -1,6 +1,14 @@
 from collections import UserDict
 import json
+import os
+from itertools import islice
+from functools import wraps
 from json import JSONDecodeError
+from instrumentation import timed
+from query_cache import QueryCache
+from note_history import NoteHistory
+from note_pages import PREFIX_LENGTH, BodyStore, read_index, write_index
+from storage import STORAGE_COMPRESSION, StorageFormatError, detect_compression, read_rows, write_rows
 
 
 class NoteNameNotProvided(Exception):
@@ -31,6 +39,9 @@ class FieldNote:
     def to_json(self):
         return self.__str__()
 
+    def startswith(self, value):
+        return str(self).startswith(value)
+
 
 class Note(FieldNote):
 
@@ -73,6 +84,25 @@ class Text(FieldNote):
         self.value = value
 
 
+class PagedText(Text):
+    '''Text that lives in the bodies file, only the offset and a short prefix stay in memory'''
+
+    def __init__(self, store, offset, length, prefix):
+        self.store = store
+        self.offset = offset
+        self.length = length
+        self.prefix = prefix
+
+    @property
+    def value(self):
+        return self.store.read(self.offset, self.length)
+
+    def startswith(self, value):
+        if len(value) <= len(self.prefix) or len(self.prefix) < PREFIX_LENGTH:
+            return self.prefix.startswith(value)
+        return self.prefix.startswith(value[:PREFIX_LENGTH]) and self.value.startswith(value)
+
+
 class Tag(FieldNote):
     def __init__(self, value):
         self.value = value
@@ -88,43 +118,133 @@ class NoteEncoder(json.JSONEncoder):
 
 
 class NoteBook(UserDict):
-
-    def add_notes(self, note:Note):
+    filename = 'notes_book.json'
+    history_filename = 'notes_history.log'
+    index_filename = 'notes_index.jsonl'
+    bodies_filename = 'notes_bodies.dat'
+    paged = os.environ.get('BOT_NOTES_PAGED') == '1'
+    compression = STORAGE_COMPRESSION
+    storage_keys = ['name', 'text', 'tags']
+
+    def __init__(self, *args, **kwargs):
+        self.version = 0
+        self.cache = QueryCache()
+        self.history = NoteHistory(self.history_filename)
+        self.load_error = None
+        self.bodies = BodyStore(self.bodies_filename) if self.paged else None
+        super().__init__(*args, **kwargs)
+
+    def add_notes(self, note:Note, track=True):
+        if self.paged and not isinstance(note.text, PagedText):
+            note.text = self.page_out(note.text.value)
         self.data[note.name.value] = note
+        self.version += 1
+        if track:
+            self.track(note)
+
+    def add_tag(self, name, tag):
+        note = self.data.get(name)
+        if not note:
+            raise NoteDoesNotExist
+        note.add_tag(tag)
+        self.version += 1
+        self.track(note)
+
+    def remove_note(self, name):
+        note = self.data.pop(name)
+        self.version += 1
+        self.track(note, deleted=True)
+
+    def track(self, note, deleted=False):
+        self.history.record(note.name.value, note.text.value, note.tags, deleted)
+
+    @classmethod
+    def storage_file(cls):
+        return cls.index_filename if cls.paged else cls.filename
+
+    def page_out(self, text):
+        offset, length = self.bodies.append(text)
+        return PagedText(self.bodies, offset, length, text[:PREFIX_LENGTH])
+
+    def note_at(self, name, version):
+        return self.history.state(name, version)
+
+    def find_notes(self, search_value):
+        '''Names of notes whose name or text starts with search_value'''
+        names = self.cache.get((self.version, search_value))
+        if names is None:
+            names = [k for k, v in self.data.items() 
+                     if k.startswith(search_value) or v.text.startswith(search_value)]
+            self.cache.put((self.version, search_value), names)
+        return names
 
     def paginator(self, iter_obj, page=1):
-        start = 0
+        keys = iter(list(iter_obj))
 
         while True:
             
-            result_keys = list(iter_obj)[start:start + page]
+            result_keys = list(islice(keys, page))
             result = ' '.join([f'{k}: {iter_obj.get(k).text.value}' for k in result_keys])
             if not result:
                 break
             yield result
-            start += page
 
     def recover_from_file(self):
-        try:
-            with open('notes_book.json') as fd:
-                data = json.load(fd)
-        except (FileNotFoundError, AttributeError, JSONDecodeError, ValueError):
-            return {}
+        if self.paged and os.path.exists(self.index_filename):
+            for name, offset, length, prefix, tags in read_index(self.index_filename):
+                text = PagedText(self.bodies, offset, length, prefix)
+                self.add_notes(Note(NameNote(name), text, Tag(tags) if tags else None), track=False)
+            return
 
-        for k, v in data.items():
-            if v['tags']:
-                self.add_notes(Note(NameNote(v['name']), Text(v['text']), Tag(v['tags'])))
+        try:
+            compression = detect_compression(self.filename)
+            if compression != 'json':
+                rows = read_rows(self.filename, 'notes', self.storage_keys, compression)
             else:
-                self.add_notes(Note(NameNote(v['name']), Text(v['text'])))
+                with open(self.filename) as fd:
+                    rows = [(v['name'], v['text'], v['tags']) for v in json.load(fd).values()]
+
+            for name, text, tags in rows:
+                if tags:
+                    self.add_notes(Note(NameNote(name), Text(text), Tag(tags)), track=False)
+                else:
+                    self.add_notes(Note(NameNote(name), Text(text)), track=False)
+        except (FileNotFoundError, AttributeError, JSONDecodeError, ValueError, EOFError, OSError):
+            return {}
+        except StorageFormatError as error:
+            self.load_error = error
+            print(f"Can't read {self.filename}: {error}")
+            print("Changes will not be saved to this file!")
 
+    @timed('persist')
     def save_to_file(self):
+        if self.load_error:
+            return
+
+        if self.paged:
+            self.bodies.flush()
+            write_index(self.index_filename, 
+                        ([note.name.value, note.text.offset, note.text.length, note.text.prefix, note.tags] 
+                         for note in self.data.values()))
+            return
+
+        self.write_file(self.filename, self.compression)
+
+    def write_file(self, filename, compression='json'):
 
-        with open('notes_book.json', "w") as fd:
+        if compression != 'json':
+            write_rows(filename, 'notes', self.storage_keys,
+                       ([note.name.value, note.text.value, note.tags] for note in self.data.values()),
+                       compression)
+            return
+
+        with open(filename, "w") as fd:
             if self.data:
                 json.dump(self.data, fd, cls=NoteEncoder, indent=3)
 
 
 def input_error(func):
+    @wraps(func)
     def inner(*args):
         try:
             return func(*args)
@@ -159,10 +279,10 @@ def add_note(note_book, *args):
         note_text = lst[1:]
         note_book.add_notes(Note(NameNote(note_name), Text(' '.join(note_text))))
 
-        if lst[0] in [k for k in note_book.keys()]:
+        if lst[0] in note_book:
 
             note_tags = input('Please enter tags for this note: ').strip().split()
-            note_book.get(lst[0]).add_tag(note_tags)
+            note_book.add_tag(lst[0], note_tags)
 
         return f'Note with name: {note_name} was added'
     else:
@@ -185,7 +305,7 @@ def add_tag(note_book, *args):
     lst = list_of_params(*args)
 
     if len(lst) > 1:
-        note_book.get(lst[0]).add_tag(lst[1:])
+        note_book.add_tag(lst[0], lst[1:])
         return f'Note {lst[0]} was update'
     else:
         raise ValueError
@@ -200,17 +320,10 @@ def get_notes(note_book, *args):
 
     search_value = lst[0]
 
-    list_of_notes = {}
-
-    for k, v in note_book.items():
-        if lst[0] == k:
-            return f'{search_value}: {v.text}'
-
-        if str(v.text).startswith(search_value):
-            list_of_notes.update({k: v.text})
+    if search_value in note_book:
+        return f'{search_value}: {note_book[search_value].text}'
 
-        if k.startswith(lst[0]):
-            list_of_notes.update({k: v.text})
+    list_of_notes = {k: note_book[k].text for k in note_book.find_notes(search_value)}
 
     if list_of_notes:
         return list_of_notes
@@ -230,15 +343,58 @@ def remove_note(note_book, *args):
     if not note_exists:
         raise NoteDoesNotExist
 
-    note_book.pop(name)
+    note_book.remove_note(name)
 
     return f'Note with name {name} was deleted'
 
 
+def format_note_version(version, text, tags, deleted):
+    if deleted:
+        return f'v{version}: (deleted)'
+    return f"v{version}: {text} | tags: {', '.join(tags) if tags else '-'}"
+
+
+@input_error
+def note_history(note_book, *args):
+
+    lst = args[0]
+    if len(lst) < 1:
+        raise NoteNameNotProvided
+
+    history = note_book.history.history(lst[0])
+    if not history:
+        raise NoteDoesNotExist
+
+    return '\n'.join(format_note_version(*item) for item in history)
+
+
+@input_error
+def note_at(note_book, *args):
+
+    lst = list_of_params(*args)
+    if not lst[1].isdigit():
+        raise ValueError
+
+    state = note_book.note_at(lst[0], int(lst[1]))
+    if not state:
+        raise NoteDoesNotExist
+
+    return format_note_version(int(lst[1]), *state)
+
+
+def cache_stats(note_book, *args):
+    if note_book.paged:
+        return f'{note_book.cache.stats()}\n{note_book.bodies.cache.stats()}'
+    return note_book.cache.stats()
+
+
 choices = {
             'add note': add_note,
             'show notes': show_notes,
             'add tag': add_tag,
             'remove note': remove_note,
+            'cache': cache_stats,
+            'note history': note_history,
+            'note at': note_at,
             'note': get_notes
            }
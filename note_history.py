@@ -0,0 +1,170 @@
+'''Version history of notes in an append-only log.
+
+Every change of a note appends one JSON line to the log. Every
+KEYFRAME_INTERVAL-th version of a note is a keyframe with the full text,
+the others keep only the delta to the previous version: a list of
+[start, end, replacement] edits of the text. A version whose delta would
+not be smaller than its text is written as a keyframe too. To rebuild a
+version the log is read from the closest regular keyframe before it, so it
+never takes more than KEYFRAME_INTERVAL lines, however long the history is.
+
+Deltas are cheap to compute for long notes: the common head and tail are
+cut off with plain string comparisons and only the rest is compared, line by
+line. A change of tags only gives an empty delta.
+'''
+
+import json
+from difflib import SequenceMatcher
+
+
+KEYFRAME_INTERVAL = 10
+
+
+def common_prefix(first: str, second: str) -> int:
+    '''Length of the common prefix, found by bisecting with slice comparisons'''
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix(first: str, second: str, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[len(first) - middle:] == second[len(second) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def line_offsets(lines):
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def make_delta(old: str, new: str):
+    if old == new:
+        return []
+
+    head = common_prefix(old, new)
+    tail = common_suffix(old, new, min(len(old), len(new)) - head)
+    old_lines = old[head:len(old) - tail].splitlines(keepends=True)
+    new_lines = new[head:len(new) - tail].splitlines(keepends=True)
+    old_offsets = line_offsets(old_lines)
+    new_offsets = line_offsets(new_lines)
+    new_middle = ''.join(new_lines)
+
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [[head + old_offsets[i1], head + old_offsets[i2], new_middle[new_offsets[j1]:new_offsets[j2]]]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def delta_size(delta) -> int:
+    '''Rough size of the delta in the log, [start, end, ""] takes about 16 characters'''
+    return sum(len(replacement) + 16 for _, _, replacement in delta)
+
+
+def apply_delta(text: str, delta):
+    for start, end, replacement in reversed(delta):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+class NoteHistory:
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.index = None
+
+    def load_index(self):
+        '''{note name: [(version, offset in the log)]}, read once on the first use'''
+        if self.index is not None:
+            return
+
+        self.index = {}
+        try:
+            with open(self.filename, 'rb') as fh:
+                offset = 0
+                for line in fh:
+                    entry = json.loads(line)
+                    self.index.setdefault(entry['name'], []).append((entry['version'], offset))
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+
+    def versions(self, name):
+        self.load_index()
+        return [version for version, _ in self.index.get(name, [])]
+
+    def record(self, name, text, tags, deleted=False):
+        self.load_index()
+        versions = self.index.setdefault(name, [])
+        state = (text, list(tags), deleted)
+
+        previous = self.state(name) if versions else None
+        if previous == state:
+            return None
+
+        version = len(versions) + 1
+        entry = {'name': name, 'version': version, 'tags': state[1], 'deleted': deleted}
+        delta = None if (version - 1) % KEYFRAME_INTERVAL == 0 else make_delta(previous[0], text)
+        if delta is None or delta_size(delta) >= len(text):
+            entry['text'] = text
+        else:
+            entry['delta'] = delta
+
+        with open(self.filename, 'ab') as fh:
+            offset = fh.tell()
+            fh.write(json.dumps(entry, ensure_ascii=False).encode() + b'\n')
+
+        versions.append((version, offset))
+        return version
+
+    def state(self, name, version=None):
+        '''(text, tags, deleted) of the note at version, the last one by default'''
+        self.load_index()
+        versions = self.index.get(name)
+        if not versions:
+            return None
+
+        if version is None:
+            version = len(versions)
+        if not 1 <= version <= len(versions):
+            return None
+
+        position = version - 1
+        keyframe = position - position % KEYFRAME_INTERVAL
+
+        with open(self.filename, 'rb') as fh:
+            for _, offset in versions[keyframe:position + 1]:
+                fh.seek(offset)
+                entry = json.loads(fh.readline())
+                text = entry['text'] if 'text' in entry else apply_delta(text, entry['delta'])
+
+        return (text, entry['tags'], entry['deleted'])
+
+    def history(self, name):
+        '''[(version, text, tags, deleted)] of every version, rebuilt in one pass over the log entries'''
+        self.load_index()
+        if name not in self.index:
+            return []
+
+        result = []
+        text = ''
+
+        with open(self.filename, 'rb') as fh:
+            for version, offset in self.index.get(name, []):
+                fh.seek(offset)
+                entry = json.loads(fh.readline())
+                text = entry['text'] if 'text' in entry else apply_delta(text, entry['delta'])
+                result.append((version, text, entry['tags'], entry['deleted']))
+
+        return result
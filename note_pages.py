@@ -0,0 +1,106 @@
+'''On-disk paging of note bodies.
+
+In paged mode the notebook keeps only names, tags, a short text prefix and
+the offset of every body in memory. Bodies are appended to one file and read
+back on demand through an LRU of hot bodies, bounded by their total size, so
+resident memory does not grow with the size of the texts. The index (one JSON line per note) is
+rewritten on save, the bodies file is append-only.
+'''
+
+import json
+import sys
+
+from query_cache import QueryCache
+
+
+PREFIX_LENGTH = 32
+BODY_CACHE_BYTES = 16 * 1024 * 1024
+
+
+class BodyCache(QueryCache):
+    '''LRU of hot bodies bounded by their total size in memory, not by their count'''
+
+    def __init__(self, maxbytes=BODY_CACHE_BYTES):
+        super().__init__()
+        self.maxbytes = maxbytes
+        self.size = 0
+
+    def put(self, key, value):
+        value_size = sys.getsizeof(value)
+        if value_size > self.maxbytes:
+            return
+
+        if key in self.data:
+            self.size -= sys.getsizeof(self.data[key])
+        self.data[key] = value
+        self.data.move_to_end(key)
+        self.size += value_size
+
+        while self.size > self.maxbytes:
+            _, old = self.data.popitem(last=False)
+            self.size -= sys.getsizeof(old)
+
+    def clear(self):
+        super().clear()
+        self.size = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0
+        return (f"Bodies cache: {self.hits} hits, {self.misses} misses ({ratio:.1f}% hits), "
+                f"{len(self.data)} bodies, {self.size // 1024}/{self.maxbytes // 1024} KiB")
+
+
+class BodyStore:
+
+    def __init__(self, filename, cache_bytes=BODY_CACHE_BYTES):
+        self.filename = filename
+        self.cache = BodyCache(cache_bytes)
+        self.fh = None
+
+    def open(self):
+        if self.fh is None:
+            self.fh = open(self.filename, 'a+b')
+        return self.fh
+
+    def append(self, text):
+        fh = self.open()
+        data = text.encode()
+        fh.seek(0, 2)
+        offset = fh.tell()
+        fh.write(data)
+        self.cache.put(offset, text)
+        return offset, len(data)
+
+    def read(self, offset, length):
+        text = self.cache.get(offset)
+        if text is None:
+            fh = self.open()
+            fh.flush()
+            fh.seek(offset)
+            text = fh.read(length).decode()
+            self.cache.put(offset, text)
+        return text
+
+    def flush(self):
+        if self.fh is not None:
+            self.fh.flush()
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+
+def write_index(filename, rows):
+    '''rows - (name, offset, length, prefix, tags)'''
+    with open(filename, 'w', encoding='utf-8') as fh:
+        for row in rows:
+            fh.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def read_index(filename):
+    with open(filename, encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
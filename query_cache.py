@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+
+class QueryCache:
+    '''Bounded LRU of query -> result ids.
+
+    Keys should include the version of the store, so a mutation makes all
+    older entries unreachable and they are pushed out by the LRU in time.
+    '''
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key):
+        result = self.data.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.data.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0
+        return f"Cache: {self.hits} hits, {self.misses} misses ({ratio:.1f}% hits), {len(self.data)}/{self.maxsize} entries"
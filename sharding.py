@@ -0,0 +1,303 @@
+'''Address book split into shards, every shard lives in its own process.
+
+Records are hash-partitioned by name (crc32, so the shard of a name does not
+depend on the process hash seed) and every shard keeps its own store file.
+Queries are sent to all shards at once, so they run on all cores, and every
+shard returns its answer through shared memory instead of the pipe. Results
+come back sorted per shard and are merged in order.
+
+The contacts menu switches to the sharded book with BOT_SHARDS=<number of
+shards>. On the first start the contacts of contacts.txt are copied into
+the shards.
+'''
+
+import json
+import os
+import zlib
+from heapq import merge
+from multiprocessing import Pipe, Process, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from bot import (AddressBook, Record, Name, Mail, Birthday, format_phones_to_list, input_error,
+                 EmptyNameField, EmptySearchQuery, ContactAlreadyExists, ContactDoesNotExist, IncorrectRangeField)
+
+
+def send_shared(connection, data):
+    payload = json.dumps(data).encode()
+    memory = SharedMemory(create=True, size=max(len(payload), 1))
+    memory.buf[:len(payload)] = payload
+    connection.send(("shared", (memory.name, len(payload))))
+    memory.close()
+
+
+def receive_shared(name, size):
+    memory = SharedMemory(name=name)
+    try:
+        return json.loads(bytes(memory.buf[:size]))
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+class Shard:
+    '''Commands that run inside a worker process against its own AddressBook'''
+
+    def __init__(self, filename):
+        self.address_book = AddressBook(filename)
+
+    def add(self, name, phones, mail=None, birthday=None):
+        record = Record(Name(name))
+        record.phones = format_phones_to_list(phones)
+        record.mail = Mail(mail)
+        record.birthday = Birthday(None)
+        self.address_book.add_record(record)
+        if birthday:
+            self.address_book.update_birthday(record, birthday)
+
+    def add_many(self, records):
+        for record in records:
+            self.add(*record)
+        return len(records)
+
+    def delete(self, name):
+        if name in self.address_book.data:
+            self.address_book.delete_record(name)
+            return True
+        return False
+
+    def get(self, name):
+        record = self.address_book.get_record_by_name(name)
+        return record.render() if record else None
+
+    def count(self):
+        return len(self.address_book.data)
+
+    def find(self, query):
+        return sorted([record.name.value, record.render()] for record in self.address_book.search(query))
+
+    def birthday_report(self, limit):
+        return [[days, record.name.value, age] for days, record, age in self.address_book.birthday_report(limit)]
+
+    def save(self):
+        self.address_book.save_data()
+
+
+SHARED_RESULTS = ("find", "birthday_report")
+# Written to the shards folder after the contacts of contacts.txt were copied in
+IMPORT_MARKER = "imported"
+
+
+def shard_worker(connection, filename):
+    shard = Shard(filename)
+
+    while True:
+        command, args = connection.recv()
+        if command == "close":
+            shard.save()
+            connection.send(("ok", None))
+            break
+
+        try:
+            result = getattr(shard, command)(*args)
+        except Exception as error:
+            connection.send(("error", error))
+            continue
+
+        if command in SHARED_RESULTS:
+            send_shared(connection, result)
+        else:
+            connection.send(("ok", result))
+
+    connection.close()
+
+
+class ShardedAddressBook:
+
+    def __init__(self, shards=None, folder="contacts_shards"):
+        self.shards = shards or os.cpu_count() or 1
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        # Workers must share our tracker, otherwise they complain about segments we unlink
+        resource_tracker.ensure_running()
+
+        self.connections = []
+        self.processes = []
+        for i in range(self.shards):
+            parent_connection, child_connection = Pipe()
+            process = Process(target=shard_worker, 
+                              args=(child_connection, os.path.join(folder, f"contacts_{i}.txt")), 
+                              daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def shard_for(self, name):
+        return zlib.crc32(name.encode()) % self.shards
+
+    def receive(self, connection):
+        status, result = connection.recv()
+        if status == "error":
+            raise result
+        if status == "shared":
+            return receive_shared(*result)
+        return result
+
+    def receive_all(self):
+        '''Read the reply of every shard before raising, so no stale reply (or shared memory) is left behind'''
+        results = []
+        errors = []
+        for connection in self.connections:
+            try:
+                results.append(self.receive(connection))
+            except Exception as error:
+                errors.append(error)
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def call(self, name, command, *args):
+        connection = self.connections[self.shard_for(name)]
+        connection.send((command, args))
+        return self.receive(connection)
+
+    def broadcast(self, command, *args):
+        '''Send the command to all shards first, then collect, so shards work in parallel'''
+        for connection in self.connections:
+            connection.send((command, args))
+        return self.receive_all()
+
+    def add(self, name, phones, mail=None, birthday=None):
+        self.call(name, "add", name, phones, mail, birthday)
+
+    def add_many(self, records):
+        '''records - iterable of (name, phones, mail, birthday)'''
+        batches = [[] for _ in range(self.shards)]
+        for record in records:
+            batches[self.shard_for(record[0])].append(record)
+
+        for connection, batch in zip(self.connections, batches):
+            connection.send(("add_many", (batch,)))
+        return sum(self.receive_all())
+
+    def delete(self, name):
+        return self.call(name, "delete", name)
+
+    def get(self, name):
+        return self.call(name, "get", name)
+
+    def __len__(self):
+        return sum(self.broadcast("count"))
+
+    def find(self, query):
+        return [line for _, line in merge(*self.broadcast("find", query))]
+
+    def birthday_report(self, limit):
+        result = merge(*self.broadcast("birthday_report", limit))
+        return [tuple(item) for _, item in zip(range(limit), result)]
+
+    def save(self, name=None):
+        '''Save the shard of the name, or all shards'''
+        if name is not None:
+            self.call(name, "save")
+        else:
+            self.broadcast("save")
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", ()))
+        for connection, process in zip(self.connections, self.processes):
+            self.receive(connection)
+            connection.close()
+            process.join()
+        self.connections = []
+        self.processes = []
+
+
+def open_sharded_book(shards=None, folder="contacts_shards"):
+    '''Start the shards, on the very first start copy the contacts of the regular store into them'''
+    book = ShardedAddressBook(shards, folder)
+    marker = os.path.join(folder, IMPORT_MARKER)
+
+    if not os.path.exists(marker):
+        if os.path.exists(AddressBook.filename):
+            book.add_many((record.name.value, 
+                           [i.value for i in record.phones], 
+                           record.mail.value, 
+                           record.birthday.value.strftime("%d.%m.%Y") if record.has_birthday() else None) 
+                          for record in AddressBook().data.values())
+            book.save()
+        with open(marker, "w") as fh:
+            fh.write(AddressBook.filename)
+
+    return book
+
+
+@input_error
+def add_record(book, params):
+
+    if not params:
+        raise EmptyNameField
+
+    name = params[0]
+    if book.get(name):
+        raise ContactAlreadyExists
+
+    book.add(name, params[1:])
+    book.save(name)
+    return f"Contact with name {name} created!"
+
+
+@input_error
+def find_records(book, params):
+
+    if not params:
+        raise EmptySearchQuery
+
+    result = book.find(params[0])
+    return '\n'.join(result) if result else "Nothing found!"
+
+
+@input_error
+def delete_record(book, params):
+
+    if not params:
+        raise EmptyNameField
+
+    name = params[0]
+    if not book.delete(name):
+        raise ContactDoesNotExist
+
+    book.save(name)
+    return f"Contact with name {name} deleted!"
+
+
+@input_error
+def birthday_reminders(book, params):
+
+    if params and not params[0].isdigit():
+        raise IncorrectRangeField
+
+    limit = int(params[0]) if params else 10
+    result = '\n'.join(f"In {days} days {name} turns {age}" for days, name, age in book.birthday_report(limit))
+    return result if result else "There are no birthdays!"
+
+
+def count_records(book, *args):
+    return f"{len(book)} contacts in {book.shards} shards"
+
+
+actions = {
+    "add": add_record,
+    "find": find_records,
+    "delete": delete_record,
+    "reminders": birthday_reminders,
+    "count": count_records,
+}
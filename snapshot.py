@@ -0,0 +1,138 @@
+'''Read-only binary snapshot of the address book.
+
+Layout (little-endian):
+    header | record table | phone table | string heap
+
+Record table is sorted by name. All strings live in the heap as utf-8 and
+are decoded only when a record is read. The snapshot is only read in full on
+start, so it has no name or phone index.
+'''
+
+import mmap
+import os
+import re
+import struct
+from collections import namedtuple
+from datetime import date
+
+
+MAGIC = b'ABSNAP01'
+VERSION = 2
+
+HEADER = struct.Struct('<8sIIQQQ')
+RECORD = struct.Struct('<QIQIiII')
+PHONE = struct.Struct('<QI')
+
+SnapshotRecord = namedtuple('SnapshotRecord', ['name', 'phones', 'mail', 'birthday'])
+
+
+class SnapshotFormatError(Exception):
+    pass
+
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def phone_key(phone) -> int:
+    if isinstance(phone, int):
+        return phone
+    # Phones of the address book are stored as +380..., no need for the regex
+    if phone[1:].isdigit() and phone.startswith('+'):
+        return int(phone[1:])
+    digits = NON_DIGITS.sub('', phone)
+    if len(digits) == 10 and digits.startswith('0'):
+        digits = '38' + digits
+    return int(digits) if digits else 0
+
+
+def write_snapshot(records, path):
+    '''records - iterable of (name, phones, mail, birthday) tuples'''
+
+    records = sorted(records, key=lambda x: x[0].encode())
+    heap = bytearray()
+    strings = {}
+
+    def put(value):
+        if not value:
+            return 0, 0
+        if value not in strings:
+            data = value.encode()
+            strings[value] = (len(heap), len(data))
+            heap.extend(data)
+        return strings[value]
+
+    record_table = bytearray()
+    phone_table = bytearray()
+    phones_total = 0
+
+    for name, phones, mail, birthday in records:
+        name_off, name_len = put(name)
+        mail_off, mail_len = put(mail)
+        ordinal = birthday.toordinal() if birthday else 0
+        record_table += RECORD.pack(name_off, name_len, mail_off, mail_len, ordinal, phones_total, len(phones))
+
+        for phone in phones:
+            phone_table += PHONE.pack(*put(phone))
+        phones_total += len(phones)
+
+    records_off = HEADER.size
+    phones_off = records_off + len(record_table)
+    heap_off = phones_off + len(phone_table)
+
+    # Written aside and moved over the old one, so a failed write never leaves a broken snapshot
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, len(records), records_off, phones_off, heap_off))
+        fh.write(record_table)
+        fh.write(phone_table)
+        fh.write(heap)
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    '''Zero-copy view over a snapshot file, records are decoded while iterating'''
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mmap)
+
+        if len(self._buf) < HEADER.size:
+            self.close()
+            raise SnapshotFormatError
+        magic, version, self.count, self._records_off, self._phones_off, self._heap_off = \
+            HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION or \
+                self._phones_off != self._records_off + self.count * RECORD.size or \
+                not self._phones_off <= self._heap_off <= len(self._buf):
+            self.close()
+            raise SnapshotFormatError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield self._record(idx)
+
+    def close(self):
+        self._buf.release()
+        self._mmap.close()
+
+    def _string(self, offset, length):
+        start = self._heap_off + offset
+        return str(self._buf[start:start + length], 'utf-8') if length else None
+
+    def _record(self, idx):
+        name_off, name_len, mail_off, mail_len, ordinal, phones_start, phones_count = \
+            RECORD.unpack_from(self._buf, self._records_off + idx * RECORD.size)
+        phones = [self._string(*PHONE.unpack_from(self._buf, self._phones_off + i * PHONE.size))
+                  for i in range(phones_start, phones_start + phones_count)]
+        birthday = date.fromordinal(ordinal) if ordinal else None
+        return SnapshotRecord(self._string(name_off, name_len), phones, self._string(mail_off, mail_len), birthday)
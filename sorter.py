@@ -1,8 +1,9 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os
 import time
 import pathlib
 import shutil
-import fnmatch
 
 
 folder_extension = {'Images': ['.jpeg', '.png', '.jpg', '.svg', '.bmp'],
@@ -12,6 +13,8 @@ folder_extension = {'Images': ['.jpeg', '.png', '.jpg', '.svg', '.bmp'],
                     'Archives': ['.zip', '.gz', '.tar'],
                     'Other': []}
 
+SCAN_WORKERS = 8
+
 exception_lst = []
 images_count = 0
 video_count = 0
@@ -33,15 +36,28 @@ def create_sort_folder(path: Path, folder_name: str):
         
         create_sort_folder(path, folder_name)
 
-def exception_search(path: Path, target_path: Path) -> bool:
-    
-    for name in exception_lst:
-        if fnmatch.fnmatch(target_path, path / name / '**/*') or \
-            fnmatch.fnmatch(target_path, path / name / '**') or \
-            fnmatch.fnmatch(target_path, path / name):
-            return True
-        
-    return False
+def scan_dir(path: str):
+    '''Read one folder, DirEntry keeps the entry type so no extra stat calls are needed'''
+    with os.scandir(path) as entries:
+        return list(entries)
+
+def scan_tree(path: Path, skip_names=(), workers: int = SCAN_WORKERS):
+    '''Walk the tree with a pool of threads, yield DirEntry of every folder and file as soon as it is read.
+        Top level entries from skip_names are not yielded and not walked into'''
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {pool.submit(scan_dir, str(path))}
+        top_level = True
+
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                for entry in future.result():
+                    if top_level and entry.name in skip_names:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        running.add(pool.submit(scan_dir, entry.path))
+                    yield entry
+            top_level = False
 
 def sort_process(path: Path, path_target: Path, name_file: str, extension: str) -> Path:
     '''sort by extension into folders.
@@ -104,10 +120,11 @@ def count_files(type_file: str):
         global other_files_count
         other_files_count += 1
 
-def sorter() -> str:
+def sorter(path: str = None) -> str:
 
-    print('Please write main path for sorting files, for example: C:\\Users\\User name')
-    path = input('>>> ')
+    if path is None:
+        print('Please write main path for sorting files, for example: C:\\Users\\User name')
+        path = input('>>> ')
     path = Path(path)
     result = 'result.txt' 
     count_files = 0
@@ -118,27 +135,25 @@ def sorter() -> str:
 
     for folder_name in folder_extension:
         create_sort_folder(path, folder_name)
-        exception_lst.append(folder_name)
+        if folder_name not in exception_lst:
+            exception_lst.append(folder_name)
+    if result not in exception_lst:
         exception_lst.append(result)
     
-    for item in path.glob('**/*'):
-        
-        if exception_search(path, item):
-            continue
+    for entry in scan_tree(path, set(exception_lst)):
+        item = Path(entry.path)
         
-        if item.is_dir():
-            if exception_search(path, item):
-                continue
+        if entry.is_dir(follow_symlinks=False):
             folders_lst.append(item)
             
-        if item.is_file():
+        elif entry.is_file():
             extension = pathlib.PurePath(item).suffix
             name = normalize(pathlib.PurePath(item).stem, count_files) + extension
             count_files += 1
             p = sort_process(path, item, name, extension)
             changing_files += '  ' + str(item) + ' --->    ' + str(p) + '\n'
                     
-    for folder in reversed(folders_lst):
+    for folder in sorted(folders_lst, key=lambda x: len(x.parts), reverse=True):
         folder.rmdir()
         changing_folders += '  ' + str(folder) + '---> deleted\n'
 
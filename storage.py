@@ -0,0 +1,90 @@
+'''Compressed storage for contacts and notes.
+
+A compressed file is a stream of JSON lines: the first line is a header with
+the format name and the list of keys, every next line is one record as a
+JSON array in the order of the keys, so key names are not repeated for every
+record. The stream is framed with gzip or, if the zstandard package is
+installed, with zstd. Files are written and read line by line, so nothing
+holds the whole file in memory.
+
+Readers detect the framing by the magic bytes, plain JSON files keep working.
+The format of new files is chosen with BOT_STORAGE=json|gzip|zstd.
+'''
+
+import gzip
+import io
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Errors of a truncated or corrupted compressed stream
+STREAM_ERRORS = (zstandard.ZstdError,) if zstandard else ()
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COMPRESSIONS = ('json', 'gzip', 'zstd') if zstandard else ('json', 'gzip')
+STORAGE_COMPRESSION = os.environ.get('BOT_STORAGE', 'json') if os.environ.get('BOT_STORAGE') in COMPRESSIONS else 'json'
+
+
+class StorageFormatError(Exception):
+    pass
+
+
+def detect_compression(path):
+    with open(path, 'rb') as fh:
+        magic = fh.read(4)
+
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return 'json'
+
+
+def open_stream(path, mode, compression):
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+
+    if compression == 'zstd':
+        if zstandard is None:
+            raise StorageFormatError('zstandard package is not installed')
+        fh = open(path, mode + 'b')
+        if mode == 'w':
+            stream = zstandard.ZstdCompressor().stream_writer(fh, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(fh, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+
+    raise StorageFormatError(f'Unknown compression {compression}')
+
+
+def write_rows(path, kind, keys, rows, compression):
+    with open_stream(path, 'w', compression) as fh:
+        fh.write(json.dumps({'format': kind, 'keys': keys}) + '\n')
+        for row in rows:
+            fh.write(json.dumps(row, separators=(',', ':'), ensure_ascii=False))
+            fh.write('\n')
+
+
+def read_rows(path, kind, keys, compression):
+    '''Yield rows of the file, any damage of the stream is raised as StorageFormatError'''
+    try:
+        with open_stream(path, 'r', compression) as fh:
+            header = json.loads(fh.readline())
+            if header.get('format') != kind:
+                raise StorageFormatError(f'{path} is not a {kind} file')
+            if header.get('keys') != keys:
+                raise StorageFormatError(f'{path} has keys {header.get("keys")}, expected {keys}')
+
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+    except FileNotFoundError:
+        raise
+    except (EOFError, OSError, UnicodeDecodeError, json.JSONDecodeError) + STREAM_ERRORS as error:
+        raise StorageFormatError(f'{path} is damaged: {error}') from error
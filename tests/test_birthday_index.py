@@ -0,0 +1,76 @@
+from datetime import date
+
+from birthday_index import BirthdayIndex, birthday_in_year, days_to_birthday, years_before
+
+
+def make_index(people):
+    index = BirthdayIndex()
+    for name, birthday in people.items():
+        index.add(name, birthday)
+    return index
+
+
+PEOPLE = {
+    'Leap': date(2000, 2, 29),
+    'March': date(2000, 3, 1),
+    'Feb28': date(2000, 2, 28),
+    'NewYear': date(1990, 1, 1),
+    'Eve': date(1995, 12, 31),
+}
+
+
+def test_29_february_is_celebrated_on_1_march_in_non_leap_years():
+    assert birthday_in_year(date(2000, 2, 29), 2023) == date(2023, 3, 1)
+    assert birthday_in_year(date(2000, 2, 29), 2024) == date(2024, 2, 29)
+    assert days_to_birthday(date(2000, 2, 29), date(2023, 2, 28)) == 1
+    assert years_before(date(2024, 2, 29), 1) == date(2023, 2, 28)
+
+
+def test_born_between_includes_both_ends():
+    index = make_index(PEOPLE)
+
+    assert index.born_between(date(2000, 2, 28), date(2000, 3, 1)) == ['Feb28', 'Leap', 'March']
+    assert index.born_between(date(2000, 2, 29), date(2000, 2, 29)) == ['Leap']
+    assert index.born_between(date(2001, 1, 1), date(2002, 1, 1)) == []
+
+
+def test_age_between_on_leap_birthdays():
+    index = make_index(PEOPLE)
+
+    # In 2023 Leap turns 23 only on 1 March
+    assert 'Leap' not in index.age_between(23, 23, date(2023, 2, 28))
+    assert 'Feb28' in index.age_between(23, 23, date(2023, 2, 28))
+    assert 'Leap' in index.age_between(23, 23, date(2023, 3, 1))
+    assert index.age_between(24, 24, date(2024, 2, 29)) == ['Feb28', 'Leap']
+
+
+def test_age_between_range_and_empty_book():
+    index = make_index(PEOPLE)
+
+    assert index.age_between(0, 120, date(2024, 6, 1)) == ['NewYear', 'Eve', 'Feb28', 'Leap', 'March']
+    assert index.age_between(33, 34, date(2024, 1, 1)) == ['NewYear']
+    assert BirthdayIndex().age_between(0, 100, date(2024, 1, 1)) == []
+
+
+def test_upcoming_wraps_over_new_year():
+    index = make_index(PEOPLE)
+
+    assert index.upcoming(date(2023, 12, 31), 2) == [(0, 'Eve'), (1, 'NewYear')]
+
+
+def test_upcoming_29_february_in_non_leap_year():
+    index = make_index(PEOPLE)
+
+    assert index.upcoming(date(2023, 2, 28), 3) == [(0, 'Feb28'), (1, 'Leap'), (1, 'March')]
+    assert index.upcoming(date(2023, 3, 1), 2) == [(0, 'Leap'), (0, 'March')]
+    assert index.upcoming(date(2024, 2, 29), 2) == [(0, 'Leap'), (1, 'March')]
+
+
+def test_remove_and_add_many_keep_the_index_sorted():
+    index = BirthdayIndex()
+    index.add_many(PEOPLE.items())
+    index.remove('Leap', PEOPLE['Leap'])
+
+    assert index.born_between(date(2000, 1, 1), date(2000, 12, 31)) == ['Feb28', 'March']
+    assert index.ordinals == sorted(index.ordinals)
+    assert index.in_month(2) == ['Feb28']
@@ -0,0 +1,56 @@
+import random
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+import birthday_index
+from birthday_index import BirthdayIndex
+
+
+def make_index(size, seed=0):
+    rnd = random.Random(seed)
+    index = BirthdayIndex()
+    index.add_many((f'n{i:05}', date(1950, 1, 1) + timedelta(days=rnd.randint(0, 365 * 60))) for i in range(size))
+    # Leap birthdays and ties on the same day
+    index.add_many([('Leap', date(2000, 2, 29)), ('Alice', date(1990, 3, 1)), ('Bob', date(1985, 3, 1))])
+    return index
+
+
+def fallback(monkeypatch):
+    monkeypatch.setattr(birthday_index, 'load_numpy', lambda: None)
+
+
+@pytest.mark.parametrize('today', [date(2023, 2, 28), date(2023, 3, 1), date(2024, 2, 28), date(2024, 2, 29),
+                                   date(2024, 12, 31)])
+@pytest.mark.parametrize('limit', [1, 3, 50, 5000])
+def test_numpy_and_fallback_reports_match(monkeypatch, today, limit):
+    pytest.importorskip('numpy')
+    index = make_index(2000)
+
+    vectorized = index.soonest(today, limit)
+    fallback(monkeypatch)
+    plain = index.soonest(today, limit)
+
+    assert vectorized == plain
+    assert len(plain) == min(limit, len(index))
+
+
+def test_ties_are_ordered_by_name(monkeypatch):
+    fallback(monkeypatch)
+    index = make_index(0)
+
+    # In 2023 Leap celebrates on 1 March together with Alice and Bob
+    assert index.soonest(date(2023, 3, 1), 3) == [(0, 'Alice', 33), (0, 'Bob', 38), (0, 'Leap', 23)]
+    assert index.soonest(date(2024, 2, 29), 2) == [(0, 'Leap', 24), (1, 'Alice', 34)]
+
+
+def test_numpy_is_not_imported_with_the_address_book():
+    root = Path(__file__).parent.parent
+    code = 'import sys, bot; print("numpy" in sys.modules)'
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,87 @@
+import json
+import random
+import time
+
+from note_history import KEYFRAME_INTERVAL, NoteHistory, apply_delta, make_delta
+
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'note', 'text', 'python', '\n']
+
+
+def random_text(rnd, words):
+    return ' '.join(rnd.choice(WORDS) for _ in range(words))
+
+
+def edit(rnd, text):
+    start = rnd.randint(0, len(text))
+    end = min(len(text), start + rnd.randint(0, 30))
+    return text[:start] + random_text(rnd, rnd.randint(0, 5)) + text[end:]
+
+
+def log_entries(history):
+    with open(history.filename, encoding='utf-8') as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_delta_round_trip():
+    rnd = random.Random(1)
+    for _ in range(200):
+        old = random_text(rnd, rnd.randint(0, 60))
+        new = edit(rnd, old) if rnd.random() < 0.8 else random_text(rnd, rnd.randint(0, 60))
+        assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_unchanged_text_gives_empty_delta():
+    assert make_delta('same text', 'same text') == []
+
+
+def test_every_version_is_rebuilt_across_keyframes(tmp_path):
+    rnd = random.Random(2)
+    history = NoteHistory(tmp_path / 'history.log')
+    versions = []
+    text = random_text(rnd, 200)
+
+    for i in range(KEYFRAME_INTERVAL * 3 + 4):
+        text = edit(rnd, text)
+        tags = ['tag'] if i % 3 else []
+        if history.record('note', text, tags) is not None:
+            versions.append((text, tags, False))
+
+    assert history.versions('note') == list(range(1, len(versions) + 1))
+    for version, state in enumerate(versions, 1):
+        assert history.state('note', version) == state
+    assert [entry[1:] for entry in history.history('note')] == versions
+
+    # The log is read fresh by another instance too
+    assert NoteHistory(tmp_path / 'history.log').state('note') == versions[-1]
+
+
+def test_large_note_tag_change_is_fast_and_stores_no_text(tmp_path):
+    history = NoteHistory(tmp_path / 'history.log')
+    text = 'x' * 50_000 + '\n' + 'y' * 50_000
+    history.record('big', text, [])
+
+    started = time.perf_counter()
+    history.record('big', text, ['tag'])
+    history.record('big', text[:20_000] + 'changed' + text[20_000:], ['tag'])
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1
+    first, tags_only, small_edit = log_entries(history)
+    assert tags_only['delta'] == []
+    assert small_edit['delta'] == [[20_000, 20_000, 'changed']]
+    assert history.state('big') == (text[:20_000] + 'changed' + text[20_000:], ['tag'], False)
+
+
+def test_rewrite_of_large_note_is_a_keyframe(tmp_path):
+    rnd = random.Random(3)
+    history = NoteHistory(tmp_path / 'history.log')
+    history.record('big', random_text(rnd, 4000), [])
+    rewritten = random_text(rnd, 4000)
+
+    started = time.perf_counter()
+    history.record('big', rewritten, [])
+    assert time.perf_counter() - started < 2
+
+    assert log_entries(history)[-1]['text'] == rewritten
+    assert history.state('big', 2)[0] == rewritten
@@ -0,0 +1,26 @@
+import json
+
+import bot
+
+
+def test_normalize_phone_takes_the_whole_value():
+    assert bot.normalize_phone('095-123-45-67') == 380951234567
+    assert bot.normalize_phone('+380951234567') == 380951234567
+    assert bot.normalize_phone('0951234567\nxyz') is None
+    assert bot.normalize_phone('095-123-45-67,') is None
+
+
+def test_normalize_phones_batch():
+    assert bot.normalize_phones(['0951234567', '067 111 22 33']) == ([380951234567, 380671112233], [])
+    assert bot.normalize_phones(['0951234567', 'x']) == ([380951234567], ['x'])
+
+
+def test_stored_phones_of_older_versions_are_loaded(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    with open('contacts.txt', 'w') as fh:
+        json.dump({'Ivan': {'phones': ['095-123-45-67,', 'junk', '+380501112233'], 'mail': None, 'birthday': None}}, fh)
+
+    address_book = bot.AddressBook()
+
+    assert [phone.value for phone in address_book.data['Ivan'].phones] == ['+380951234567', '+380501112233']
+    assert 'Skipped invalid phone <junk> of Ivan' in capsys.readouterr().out
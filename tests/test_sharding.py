@@ -0,0 +1,44 @@
+import pytest
+
+import bot
+from sharding import open_sharded_book
+
+
+def save_contacts(names):
+    address_book = bot.AddressBook()
+    for name in names:
+        record = bot.Record(bot.Name(name))
+        record.phones = bot.format_phones_to_list(['0951234567'])
+        record.mail = bot.Mail(None)
+        record.birthday = bot.Birthday(None)
+        address_book.add_record(record)
+    address_book.save_data()
+
+
+def test_contacts_are_imported_only_on_the_first_start(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_contacts(['Ivan', 'Olga'])
+
+    with open_sharded_book(2) as book:
+        assert len(book) == 2
+        book.delete('Ivan')
+        book.delete('Olga')
+        book.save()
+
+    with open_sharded_book(2) as book:
+        assert len(book) == 0
+
+
+def test_failed_batch_leaves_no_stale_replies(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    with open_sharded_book(2) as book:
+        names = {}
+        for name in 'ABCDEFGH':
+            names.setdefault(book.shard_for(name), name)
+
+        with pytest.raises(bot.IncorrectPhoneField):
+            book.add_many([(names[0], ['bad'], None, None), (names[1], ['0951234567'], None, None)])
+
+        assert book.broadcast('count') == [0, 1]
+        assert len(book.find(names[1])) == 1
@@ -0,0 +1,102 @@
+import os
+from datetime import date
+
+import pytest
+
+import bot
+from snapshot import HEADER, MAGIC, Snapshot, SnapshotFormatError, write_snapshot
+
+
+RECORDS = [
+    ('Олена', ['+380951234567', '+380671112233'], 'olena@example.com', date(1990, 2, 28)),
+    ('Bob', [], None, None),
+    ('Anna', ['+380951234567'], None, date(2000, 2, 29)),
+]
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'contacts.snapshot'
+    write_snapshot(RECORDS, path)
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        assert [tuple(record) for record in snapshot] == sorted(RECORDS, key=lambda x: x[0].encode())
+    assert not os.path.exists(f'{path}.tmp')
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / 'contacts.snapshot'
+    write_snapshot([], path)
+
+    with Snapshot(path) as snapshot:
+        assert list(snapshot) == []
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'magic', 'version'])
+def test_damaged_snapshot_raises_format_error(tmp_path, damage):
+    path = tmp_path / 'contacts.snapshot'
+    write_snapshot(RECORDS, path)
+    data = bytearray(path.read_bytes())
+    if damage == 'truncate':
+        data = data[:HEADER.size + 10]
+    elif damage == 'magic':
+        data[:len(MAGIC)] = b'XXXXXXXX'
+    else:
+        data[len(MAGIC)] = 1
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotFormatError):
+        Snapshot(path)
+
+
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    address_book = bot.AddressBook()
+    bot.add_record(address_book, ['Anna', '0951234567'])
+    address_book.save_data()
+    return address_book
+
+
+def make_fresh(path):
+    stat = os.stat('contacts.txt')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+
+def test_address_book_loads_from_fresh_snapshot(tmp_path, monkeypatch):
+    make_store(tmp_path, monkeypatch)
+    write_snapshot(RECORDS, 'contacts.snapshot')
+    make_fresh('contacts.snapshot')
+
+    address_book = bot.AddressBook()
+
+    assert sorted(address_book.data) == ['Anna', 'Bob', 'Олена']
+    assert [phone.value for phone in address_book.data['Олена'].phones] == ['+380951234567', '+380671112233']
+    assert address_book.data['Олена'].mail.value == 'olena@example.com'
+    assert address_book.find_by_mail('olena@example.com') == ['Олена']
+    assert [record.name.value for record in address_book.born_between(date(2000, 1, 1), date(2000, 12, 31))] == ['Anna']
+
+
+def test_address_book_ignores_stale_or_damaged_snapshot(tmp_path, monkeypatch):
+    make_store(tmp_path, monkeypatch)
+    write_snapshot(RECORDS, 'contacts.snapshot')
+    os.utime('contacts.snapshot', ns=(0, 0))
+
+    assert sorted(bot.AddressBook().data) == ['Anna']
+
+    open('contacts.snapshot', 'wb').write(b'\0' * 100)
+    make_fresh('contacts.snapshot')
+
+    assert sorted(bot.AddressBook().data) == ['Anna']
+
+
+def test_refresh_snapshot_follows_the_store(tmp_path, monkeypatch):
+    address_book = make_store(tmp_path, monkeypatch)
+    address_book.refresh_snapshot()
+    bot.add_record(address_book, ['Bob', '0671112233'])
+    address_book.save_data()
+    os.utime('contacts.snapshot', ns=(0, 0))
+
+    address_book.refresh_snapshot()
+
+    with Snapshot('contacts.snapshot') as snapshot:
+        assert [record.name for record in snapshot] == ['Anna', 'Bob']
@@ -0,0 +1,76 @@
+import pytest
+
+import bot
+import note
+from storage import StorageFormatError, detect_compression, read_rows, write_rows
+
+
+KEYS = ['name', 'phones', 'mail', 'birthday']
+ROWS = [[f'Name{i}', ['+380951234567'], None, None] for i in range(2000)]
+
+
+def test_rows_round_trip(tmp_path):
+    path = tmp_path / 'contacts.txt'
+    write_rows(path, 'contacts', KEYS, ROWS, 'gzip')
+
+    assert detect_compression(path) == 'gzip'
+    assert list(read_rows(path, 'contacts', KEYS, 'gzip')) == ROWS
+
+
+def test_truncated_gzip_raises_storage_error(tmp_path):
+    path = tmp_path / 'contacts.txt'
+    write_rows(path, 'contacts', KEYS, ROWS, 'gzip')
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+
+    with pytest.raises(StorageFormatError):
+        list(read_rows(path, 'contacts', KEYS, 'gzip'))
+
+
+def test_key_header_mismatch_raises_storage_error(tmp_path):
+    path = tmp_path / 'contacts.txt'
+    write_rows(path, 'contacts', ['name', 'phones'], [['A', []]], 'gzip')
+
+    with pytest.raises(StorageFormatError, match='keys'):
+        list(read_rows(path, 'contacts', KEYS, 'gzip'))
+
+
+def test_wrong_kind_raises_storage_error(tmp_path):
+    path = tmp_path / 'notes.txt'
+    write_rows(path, 'notes', KEYS, [], 'gzip')
+
+    with pytest.raises(StorageFormatError, match='not a contacts file'):
+        list(read_rows(path, 'contacts', KEYS, 'gzip'))
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'keys'])
+def test_unreadable_contacts_are_not_overwritten(tmp_path, monkeypatch, capsys, damage):
+    monkeypatch.chdir(tmp_path)
+    if damage == 'keys':
+        write_rows('contacts.txt', 'contacts', ['name', 'phones'], [['A', []]], 'gzip')
+    else:
+        write_rows('contacts.txt', 'contacts', KEYS, ROWS, 'gzip')
+        data = open('contacts.txt', 'rb').read()
+        open('contacts.txt', 'wb').write(data[:len(data) // 2])
+    before = open('contacts.txt', 'rb').read()
+
+    address_book = bot.AddressBook()
+    bot.add_record(address_book, ['New', '0951234567'])
+
+    assert address_book.load_error is not None
+    assert "Can't read contacts.txt" in capsys.readouterr().out
+    assert open('contacts.txt', 'rb').read() == before
+
+
+def test_unreadable_notes_are_not_overwritten(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_rows(note.NoteBook.filename, 'notes', ['name', 'text'], [['a', 'b']], 'gzip')
+    before = open(note.NoteBook.filename, 'rb').read()
+
+    notebook = note.NoteBook()
+    notebook.recover_from_file()
+    notebook.add_notes(note.Note(note.NameNote('new'), note.Text('text')))
+    notebook.save_to_file()
+
+    assert notebook.load_error is not None
+    assert open(note.NoteBook.filename, 'rb').read() == before
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from watcher import watch
+
+
+def write_in_chunks(path, chunks, pause, done):
+    with open(path, 'wb') as fh:
+        for chunk in chunks:
+            fh.write(chunk)
+            fh.flush()
+            time.sleep(pause)
+    done.set()
+
+
+def test_file_written_in_chunks_is_sorted_only_when_complete(tmp_path):
+    chunks = [b'x' * 1024] * 6
+    done = threading.Event()
+    writer = threading.Thread(target=write_in_chunks, args=(tmp_path / 'report.txt', chunks, 0.1, done))
+    writer.start()
+
+    result = watch(tmp_path, settle=0.4, interval=0.05, polling=True, max_files=1, timeout=10)
+    # The file kept changing every 0.1 s, so it may be sorted only after the writer is done
+    assert done.is_set()
+    writer.join()
+
+    assert result == 'Watch stopped, sorted files: 1'
+    assert not (tmp_path / 'report.txt').exists()
+    sorted_files = list((tmp_path / 'Documents').iterdir())
+    assert len(sorted_files) == 1
+    assert sorted_files[0].read_bytes() == b''.join(chunks)
+
+
+def test_file_in_folder_before_start_is_sorted(tmp_path):
+    (tmp_path / 'photo.jpg').write_bytes(b'jpg')
+
+    result = watch(tmp_path, settle=0.1, interval=0.05, polling=True, max_files=1, timeout=10)
+
+    assert result == 'Watch stopped, sorted files: 1'
+    assert [item.suffix for item in (tmp_path / 'Images').iterdir()] == ['.jpg']
+
+
+def test_watch_stops_on_timeout(tmp_path):
+    started = time.monotonic()
+
+    result = watch(tmp_path, settle=0.1, interval=0.05, polling=True, timeout=0.3)
+
+    assert result == 'Watch stopped, sorted files: 0'
+    assert time.monotonic() - started < 5
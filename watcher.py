@@ -0,0 +1,155 @@
+'''Watch mode for the sorter.
+
+Files that land in the drop folder are sorted one by one as they arrive,
+instead of rescanning the whole tree. On Linux the folder is watched with
+inotify, everywhere else (and in tests) with polling. A file is sorted only
+after its size and mtime did not change for `settle` seconds, so partially
+written files are left alone.
+'''
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from sorter import folder_extension, normalize, sort_process
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+IN_ISDIR = 0x40000000
+EVENT_HEADER = struct.Struct('iIII')
+SKIPPED_NAMES = {'result.txt'}
+
+
+class InotifyWatcher:
+    '''Yields names of files created, moved in or closed after writing in the folder'''
+
+    def __init__(self, path: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+    def events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name and not mask & IN_ISDIR:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    '''Same interface as InotifyWatcher, lists the folder every interval'''
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.seen = {}
+
+    def events(self, timeout):
+        time.sleep(timeout)
+        names = []
+        current = {}
+
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                    if self.seen.get(entry.name) != current[entry.name]:
+                        names.append(entry.name)
+
+        self.seen = current
+        return names
+
+    def close(self):
+        pass
+
+
+def create_watcher(path: Path, polling=False):
+    if not polling and hasattr(select, 'select'):
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(path)
+
+
+def file_state(path: Path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def watch(path, settle=1.0, interval=0.5, polling=False, max_files=None, timeout=None) -> str:
+    '''Sort files as they arrive in path until Ctrl+C, max_files sorted files or timeout seconds'''
+
+    path = Path(path)
+    for folder_name in folder_extension:
+        (path / folder_name).mkdir(exist_ok=True)
+
+    watcher = create_watcher(path, polling)
+    pending = {}
+    sorted_count = 0
+    started = time.monotonic()
+
+    # Files that were already in the folder before the watch started
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                pending[entry.name] = (file_state(path / entry.name), time.monotonic())
+
+    try:
+        while max_files is None or sorted_count < max_files:
+            if timeout is not None and time.monotonic() - started > timeout:
+                break
+
+            for name in watcher.events(interval if not pending else min(interval, settle)):
+                pending[name] = (file_state(path / name), time.monotonic())
+
+            now = time.monotonic()
+            for name, (state, since) in list(pending.items()):
+                item = path / name
+                current = file_state(item)
+
+                if current is None or name in SKIPPED_NAMES:
+                    del pending[name]
+                elif current != state:
+                    pending[name] = (current, now)
+                elif now - since >= settle:
+                    del pending[name]
+                    new_name = normalize(item.stem, sorted_count) + item.suffix
+                    target = sort_process(path, item, new_name, item.suffix)
+                    sorted_count += 1
+                    print(f'  {item} --->    {target}')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    return f'Watch stopped, sorted files: {sorted_count}'